@@ -1,6 +1,18 @@
+import asyncio
+import atexit
+import hashlib
 import os
+import queue
+import random
+import re
+import select
+import shutil
+import sqlite3
 import subprocess
 import tempfile
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,7 +25,106 @@ except Exception:
     OPENAI_AVAILABLE = False
     print("OpenAI API not available or credentials missing.")
 
+try:
+    from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
+    ASYNC_OPENAI_AVAILABLE = True
+except ImportError:
+    ASYNC_OPENAI_AVAILABLE = False
+
+TRANSLATION_MODEL = "gpt-4"
+TRANSLATION_SYSTEM_PROMPT = "You are a helpful assistant that translates natural language queries into valid Prolog code. Return only the Prolog code without any explanations or markdown."
+
+class TranslationCache:
+    def __init__(self, path=None, memory_size=1024, max_entries=None, ttl=None):
+        self.path = path or os.getenv("TRANSLATION_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "prolog_translations.sqlite3"))
+        self.memory_size = memory_size
+        self.max_entries = max_entries or int(os.getenv("TRANSLATION_CACHE_SIZE", "100000"))
+        self.ttl = ttl or float(os.getenv("TRANSLATION_CACHE_TTL", str(7 * 24 * 3600)))
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, prolog_code TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed)")
+        self.connection.commit()
+
+    @staticmethod
+    def key(query, model, system_prompt):
+        normalized = " ".join(query.split())
+        return hashlib.sha256("\0".join([model, system_prompt, normalized]).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl:
+                    self.memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self.memory[key]
+            row = self.connection.execute("SELECT prolog_code, created FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE translations SET accessed = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+            self.remember(key, row[0], row[1])
+            self.disk_hits += 1
+            return row[0]
+
+    def put(self, key, prolog_code):
+        now = time.time()
+        with self.lock:
+            self.remember(key, prolog_code, now)
+            self.connection.execute("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)", (key, prolog_code, now, now))
+            self.connection.execute("DELETE FROM translations WHERE created < ?", (now - self.ttl,))
+            self.connection.execute(
+                "DELETE FROM translations WHERE key IN (SELECT key FROM translations ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self.connection.commit()
+
+    def remember(self, key, prolog_code, created):
+        self.memory[key] = (prolog_code, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+                "disk_entries": self.connection.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            }
+
+translation_cache = None
+translation_cache_lock = threading.Lock()
+
+def get_translation_cache():
+    global translation_cache
+    with translation_cache_lock:
+        if translation_cache is None:
+            translation_cache = TranslationCache()
+        return translation_cache
+
 def translate_to_prolog(query):
+    cache = get_translation_cache()
+    cache_key = cache.key(query, TRANSLATION_MODEL, TRANSLATION_SYSTEM_PROMPT)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     if not OPENAI_AVAILABLE:
         print("Since OpenAI API is not available, please enter the Prolog code directly:")
         print("(Type 'END' on a new line when finished)")
@@ -27,14 +138,15 @@ def translate_to_prolog(query):
     
     try:
         response = client.chat.completions.create(
-            model="gpt-4",
+            model=TRANSLATION_MODEL,
             messages=[
-                {"role": "system", "content": "You are a helpful assistant that translates natural language queries into valid Prolog code. Return only the Prolog code without any explanations or markdown."},
+                {"role": "system", "content": TRANSLATION_SYSTEM_PROMPT},
                 {"role": "user", "content": f"Translate this query into Prolog: {query}"}
             ],
             temperature=0.1
         )
         prolog_code = response.choices[0].message.content.strip()
+        cache.put(cache_key, prolog_code)
         return prolog_code
     except Exception as e:
         print(f"Error calling OpenAI API: {str(e)}")
@@ -48,53 +160,564 @@ def translate_to_prolog(query):
             lines.append(line)
         return "\n".join(lines)
 
-def run_prolog_query(prolog_code, query):
-    if query.endswith('.'):
-        query = query[:-1]
-    
-    with tempfile.NamedTemporaryFile(suffix='.pl', mode='w', delete=False) as tmp:
-        tmp_path = tmp.name
-        tmp.write(prolog_code)
-        with tempfile.NamedTemporaryFile(suffix='.pl', mode='w', delete=False) as query_file:
-            query_path = query_file.name
-            query_file.write(f"""
-:- initialization(main).
-
-main :-
-    consult('{tmp_path}'),
-    (({query}) -> 
-        writeln('RESULT_SUCCESS')
-    ;
-        writeln('RESULT_FAILURE')
+class AsyncTranslationClient:
+    def __init__(self, api_key=None, base_url=None, max_concurrency=8, max_retries=5, base_delay=0.5, max_delay=30.0, timeout=60.0, cache=None):
+        if not ASYNC_OPENAI_AVAILABLE:
+            raise RuntimeError("The openai package is required for AsyncTranslationClient.")
+        self.client = AsyncOpenAI(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            base_url=base_url or os.getenv("OPENAI_BASE_URL"),
+            max_retries=0,
+            timeout=timeout
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache = get_translation_cache() if cache is None else cache
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.client.close()
+
+    def backoff(self, attempt, error):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return max(delay, min(self.max_delay, float(retry_after)))
+        except (TypeError, ValueError):
+            return delay
+
+    def failure(self, query, error, attempts):
+        return {
+            "query": query,
+            "success": False,
+            "error": str(error),
+            "error_type": type(error).__name__,
+            "status_code": getattr(error, "status_code", None),
+            "attempts": attempts
+        }
+
+    async def translate(self, query):
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.key(query, TRANSLATION_MODEL, TRANSLATION_SYSTEM_PROMPT)
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                return {"query": query, "success": True, "prolog_code": cached, "cached": True, "attempts": 0}
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with self.semaphore:
+                    response = await self.client.chat.completions.create(
+                        model=TRANSLATION_MODEL,
+                        messages=[
+                            {"role": "system", "content": TRANSLATION_SYSTEM_PROMPT},
+                            {"role": "user", "content": f"Translate this query into Prolog: {query}"}
+                        ],
+                        temperature=0.1
+                    )
+                prolog_code = response.choices[0].message.content.strip()
+                if self.cache:
+                    await asyncio.to_thread(self.cache.put, cache_key, prolog_code)
+                return {"query": query, "success": True, "prolog_code": prolog_code, "cached": False, "attempts": attempt}
+            except (RateLimitError, APIConnectionError, InternalServerError) as e:
+                if attempt > self.max_retries:
+                    return self.failure(query, e, attempt)
+                await asyncio.sleep(self.backoff(attempt, e))
+            except Exception as e:
+                return self.failure(query, e, attempt)
+
+    async def translate_many(self, queries):
+        return await asyncio.gather(*(self.translate(query) for query in queries))
+
+PROLOG_WORKER_PROGRAM = r"""
+:- multifile user:message_hook/3.
+:- dynamic program_messages/2.
+
+user:message_hook(_, Kind, Lines) :-
+    memberchk(Kind, [error, warning]),
+    with_output_to(string(Text), print_message_lines(current_output, kind(Kind), Lines)),
+    recordz(captured_message, Text).
+
+:- initialization(serve, main).
+
+serve :-
+    prompt(_, ''),
+    repeat,
+    read_term(user_input, Request, []),
+    (   Request == end_of_file
+    ->  !
+    ;   catch(handle(Request), Error, print_message(error, Error)),
+        format("~N__END__~n"),
+        flush_output,
+        fail
+    ).
+
+handle(ping) :-
+    format("__PONG__~n").
+handle(unload(Module)) :-
+    unload_program(Module).
+handle(run(Module, File, GoalString)) :-
+    ensure_program(Module, File, LoadMessages),
+    clear_messages,
+    (   catch(term_string(Goal, GoalString, [module(Module)]), E, (print_message(error, E), fail)),
+        isolated(Module, catch(Module:Goal, E2, (print_message(error, E2), fail)))
+    ->  Status = success
+    ;   Status = failure
     ),
-    halt.
-""")
-    
-    try:
-        result = subprocess.run(
-            ['swipl', '-q', '-l', query_path],
-            capture_output=True,
-            text=True,
-            check=False
+    report_messages(LoadMessages),
+    format("~N__STATUS__ ~w~n", [Status]).
+handle(compile(Module, File)) :-
+    unload_program(Module),
+    clear_messages,
+    catch(qcompile(File, [imports([])]), E, print_message(error, E)),
+    findall(Text, recorded(captured_message, Text), Messages),
+    assertz(program_messages(Module, Messages)),
+    (   Messages == []
+    ->  Status = success
+    ;   Status = failure
+    ),
+    format("~N__STATUS__ ~w~n", [Status]).
+handle(batch(Module, File, GoalStrings, Limit)) :-
+    ensure_program(Module, File, LoadMessages),
+    forall(nth1(Index, GoalStrings, GoalString),
+           run_batch_goal(Module, LoadMessages, Index, GoalString, Limit)).
+
+run_batch_goal(Module, LoadMessages, Index, GoalString, Limit) :-
+    clear_messages,
+    format("~N__GOAL__ ~w~n", [Index]),
+    (   catch(term_string(Goal, GoalString, [module(Module), variable_names(Bindings)]), E, (print_message(error, E), fail))
+    ->  catch(isolated(Module, forall(limited(Limit, Module:Goal), emit_solution(Bindings))), E2, print_message(error, E2))
+    ;   true
+    ),
+    report_messages(LoadMessages),
+    format("~N__STATUS__ done~n").
+
+isolated(Module, Goal) :-
+    findall(Key-Value, user_global(Key, Value), Globals),
+    call_cleanup(isolated_call(Goal), restore_state(Module, Globals)).
+
+isolated_call(Goal) :-
+    predicate_property(system:snapshot(_), defined),
+    !,
+    snapshot(Goal).
+isolated_call(Goal) :-
+    once(Goal).
+
+restore_state(Module, Globals) :-
+    findall(Key, ( user_global(Key, _), \+ memberchk(Key-_, Globals) ), Added),
+    forall(member(Key, Added), nb_delete(Key)),
+    forall(member(Key-Value, Globals), nb_setval(Key, Value)),
+    (   predicate_property(system:snapshot(_), defined)
+    ->  true
+    ;   unload_program(Module)
+    ).
+
+user_global(Key, Value) :-
+    nb_current(Key, Value),
+    atom(Key),
+    \+ sub_atom(Key, 0, _, _, '$').
+
+limited(all, Goal) :-
+    !,
+    call(Goal).
+limited(Limit, Goal) :-
+    limit(Limit, Goal).
+
+emit_solution(Bindings) :-
+    format("~N__SOLUTION__"),
+    forall(( member(Name=Value, Bindings), \+ sub_atom(Name, 0, _, _, '_') ),
+           format("\t~w=~q", [Name, Value])),
+    nl.
+
+clear_messages :-
+    forall(recorded(captured_message, _, Ref), erase(Ref)).
+
+report_messages(LoadMessages) :-
+    findall(Text, recorded(captured_message, Text), RunMessages),
+    append(LoadMessages, RunMessages, Messages),
+    forall(member(Message, Messages), emit_message(Message)).
+
+ensure_program(Module, _, Messages) :-
+    program_messages(Module, Messages),
+    !.
+ensure_program(Module, File, Messages) :-
+    clear_messages,
+    catch(load_files(File, [if(true), imports([])]), E, print_message(error, E)),
+    findall(Text, recorded(captured_message, Text), Messages),
+    assertz(program_messages(Module, Messages)).
+
+unload_program(Module) :-
+    retractall(program_messages(Module, _)),
+    forall(module_property(Module, file(File)), catch(unload_file(File), _, true)).
+
+emit_message(Text) :-
+    split_string(Text, "\n", "", Lines),
+    forall(member(Line, Lines), format("~N__MESSAGE__ ~w~n", [Line])).
+"""
+
+PROLOG_MODULE_DECLARATION = re.compile(r"^\s*:-\s*module\(\s*([a-z]\w*)", re.MULTILINE)
+
+def prolog_quote(text, quote="'"):
+    escaped = text.replace("\\", "\\\\").replace(quote, "\\" + quote).replace("\n", "\\n")
+    return f"{quote}{escaped}{quote}"
+
+class PrologWorker:
+    def __init__(self, program_path, max_programs=32):
+        self.program_path = program_path
+        self.max_programs = max_programs
+        self.process = None
+        self.buffer = b""
+        self.programs = OrderedDict()
+        self.start()
+
+    def start(self):
+        self.process = subprocess.Popen(
+            ['swipl', '-q', self.program_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT
         )
-        stdout = result.stdout.strip()
-        stderr = result.stderr.strip()
-        os.unlink(tmp_path)
-        os.unlink(query_path)
-        if stderr:
-            return {"success": False, "error": stderr}
-        if 'RESULT_SUCCESS' in stdout:
-            return {"success": True, "output": stdout.replace('RESULT_SUCCESS', '').strip()}
+        self.buffer = b""
+        self.programs.clear()
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=1)
+        except Exception:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def readline(self, deadline):
+        fd = self.process.stdout.fileno()
+        while b"\n" not in self.buffer:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    raise TimeoutError("Prolog worker timed out")
+            ready, _, _ = select.select([fd], [], [], timeout)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise EOFError("Prolog worker exited unexpectedly")
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line.decode("utf-8", errors="replace")
+
+    def request(self, command, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.process.stdin.write((command + "\n").encode("utf-8"))
+        self.process.stdin.flush()
+        lines = []
+        while True:
+            line = self.readline(deadline)
+            if line == "__END__":
+                return lines
+            lines.append(line)
+
+    @staticmethod
+    def remaining(deadline):
+        if deadline is None:
+            return None
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            raise TimeoutError("Prolog worker timed out")
+        return timeout
+
+    def ping(self, timeout=5):
+        try:
+            return self.alive() and self.request("ping.", timeout) == ["__PONG__"]
+        except (OSError, EOFError, TimeoutError):
+            return False
+
+    def unload(self, program_key, timeout=None):
+        module, _ = self.programs.pop(program_key)
+        self.request(f"unload({prolog_quote(module)}).", timeout)
+
+    def compile(self, module, source_path, timeout=None):
+        lines = self.request(f"compile({prolog_quote(module)}, {prolog_quote(source_path)}).", timeout)
+        return "__STATUS__ success" in lines
+
+    def program_request(self, program_key, module, resolve_file, build_command, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if program_key in self.programs:
+            program_file = self.programs[program_key][1]
         else:
-            return {"success": False, "output": stdout.replace('RESULT_FAILURE', '').strip()}
-    except Exception as e:
+            for other_key, (other_module, _) in list(self.programs.items()):
+                if other_module == module:
+                    self.unload(other_key, self.remaining(deadline))
+            if len(self.programs) >= self.max_programs:
+                self.unload(next(iter(self.programs)), self.remaining(deadline))
+            program_file = resolve_file(lambda source_path: self.compile(module, source_path, self.remaining(deadline)))
+        lines = self.request(build_command(prolog_quote(module), prolog_quote(program_file)), self.remaining(deadline))
+        self.programs[program_key] = (module, program_file)
+        self.programs.move_to_end(program_key)
+        return lines
+
+    def run(self, program_key, module, resolve_file, query, timeout=None):
+        goal = prolog_quote(query, '"')
+        lines = self.program_request(program_key, module, resolve_file, lambda module_atom, file_atom: f"run({module_atom}, {file_atom}, {goal}).", timeout)
+        output, messages, status = [], [], "failure"
+        for line in lines:
+            if line.startswith("__MESSAGE__ "):
+                messages.append(line[len("__MESSAGE__ "):])
+            elif line.startswith("__STATUS__ "):
+                status = line[len("__STATUS__ "):].strip()
+            else:
+                output.append(line)
+        if messages:
+            return {"success": False, "error": "\n".join(messages).strip()}
+        return {"success": status == "success", "output": "\n".join(output).strip()}
+
+    def batch(self, program_key, module, resolve_file, queries, limit=None, timeout=None):
+        goals = ", ".join(prolog_quote(query, '"') for query in queries)
+        limit_term = "all" if limit is None else int(limit)
+        lines = self.program_request(program_key, module, resolve_file, lambda module_atom, file_atom: f"batch({module_atom}, {file_atom}, [{goals}], {limit_term}).", timeout)
+        results = []
+        current = None
+        for line in lines:
+            if line.startswith("__GOAL__ "):
+                current = {"solutions": [], "output": [], "messages": []}
+                results.append(current)
+            elif current is None or line.startswith("__STATUS__ "):
+                continue
+            elif line.startswith("__SOLUTION__"):
+                bindings = {}
+                for pair in line.split("\t")[1:]:
+                    name, value = pair.split("=", 1)
+                    bindings[name] = value
+                current["solutions"].append(bindings)
+            elif line.startswith("__MESSAGE__ "):
+                current["messages"].append(line[len("__MESSAGE__ "):])
+            else:
+                current["output"].append(line)
+        batch_results = []
+        for query, result in zip(queries, results):
+            batch_result = {
+                "query": query,
+                "success": bool(result["solutions"]) and not result["messages"],
+                "solutions": result["solutions"],
+                "output": "\n".join(result["output"]).strip()
+            }
+            if result["messages"]:
+                batch_result["error"] = "\n".join(result["messages"]).strip()
+            batch_results.append(batch_result)
+        return batch_results
+
+class CompiledProgramCache:
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or os.getenv("PROLOG_QLF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "prolog_qlf_cache"))
+        self.max_bytes = max_bytes or int(os.getenv("PROLOG_QLF_CACHE_BYTES", str(256 * 1024 * 1024)))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.key_locks = [threading.Lock() for _ in range(64)]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncacheable = 0
+
+    def load_path(self, key, source_path, compile_program):
+        qlf_path = os.path.join(self.cache_dir, f"{key}.qlf")
+        with self.key_locks[int(key[:8], 16) % len(self.key_locks)]:
+            if os.path.exists(qlf_path):
+                try:
+                    os.utime(qlf_path)
+                    with self.lock:
+                        self.hits += 1
+                    return qlf_path
+                except FileNotFoundError:
+                    pass
+            with self.lock:
+                self.misses += 1
+            if not self.compile(key, source_path, qlf_path, compile_program):
+                with self.lock:
+                    self.uncacheable += 1
+                return source_path
+        self.evict(keep=qlf_path)
+        return qlf_path
+
+    def compile(self, key, source_path, qlf_path, compile_program):
+        build_dir = tempfile.mkdtemp(prefix="build_", dir=self.cache_dir)
         try:
-            os.unlink(tmp_path)
-            os.unlink(query_path)
-        except:
-            pass
+            build_source = os.path.join(build_dir, f"{key}.pl")
+            shutil.copyfile(source_path, build_source)
+            build_qlf = os.path.join(build_dir, f"{key}.qlf")
+            if not compile_program(build_source) or not os.path.exists(build_qlf):
+                return False
+            os.replace(build_qlf, qlf_path)
+            return True
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+    def evict(self, keep=None):
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".qlf") and os.path.join(self.cache_dir, name) != keep:
+                    try:
+                        stat = os.stat(os.path.join(self.cache_dir, name))
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "uncacheable": self.uncacheable
+            }
+
+class PrologWorkerPool:
+    def __init__(self, size=None, timeout=None, max_programs=32, health_check_interval=None, cache=None):
+        self.size = size or int(os.getenv("PROLOG_POOL_SIZE", "4"))
+        self.timeout = timeout
+        self.cache = CompiledProgramCache() if cache is None else cache
+        self.workdir = tempfile.mkdtemp(prefix="prolog_pool_")
+        self.program_path = os.path.join(self.workdir, "worker.pl")
+        with open(self.program_path, "w") as f:
+            f.write(PROLOG_WORKER_PROGRAM)
+        self.file_lock = threading.Lock()
+        self.idle = queue.Queue()
+        self.workers = []
+        for _ in range(self.size):
+            worker = PrologWorker(self.program_path, max_programs)
+            self.workers.append(worker)
+            self.idle.put(worker)
+        self.closed = threading.Event()
+        if health_check_interval:
+            threading.Thread(target=self.health_check_loop, args=(health_check_interval,), daemon=True).start()
+
+    def program_file(self, prolog_code):
+        key = hashlib.sha256(prolog_code.encode("utf-8")).hexdigest()
+        declared = PROLOG_MODULE_DECLARATION.search(prolog_code)
+        module = declared.group(1) if declared else f"p_{key[:16]}"
+        path = os.path.join(self.workdir, f"{key}.pl")
+        with self.file_lock:
+            if not os.path.exists(path):
+                with open(path, "w") as f:
+                    if not declared:
+                        f.write(f":- module({module}, []). ")
+                    f.write(prolog_code)
+        return key, module, path
+
+    def resolver(self, key, path):
+        if not self.cache:
+            return lambda compile_program: path
+        return lambda compile_program: self.cache.load_path(key, path, compile_program)
+
+    def run(self, prolog_code, query, timeout=None):
+        key, module, path = self.program_file(prolog_code)
+        worker = self.idle.get()
+        try:
+            if not worker.alive():
+                worker.restart()
+            return worker.run(key, module, self.resolver(key, path), query, timeout or self.timeout)
+        except (OSError, EOFError, TimeoutError) as e:
+            worker.restart()
+            return {"success": False, "error": str(e)}
+        finally:
+            self.idle.put(worker)
+
+    def batch(self, prolog_code, queries, limit=None, timeout=None):
+        key, module, path = self.program_file(prolog_code)
+        worker = self.idle.get()
+        try:
+            if not worker.alive():
+                worker.restart()
+            return worker.batch(key, module, self.resolver(key, path), queries, limit, timeout or self.timeout)
+        except (OSError, EOFError, TimeoutError) as e:
+            worker.restart()
+            return [{"query": query, "success": False, "solutions": [], "error": str(e)} for query in queries]
+        finally:
+            self.idle.put(worker)
+
+    def health_check(self):
+        restarted = 0
+        checked = []
+        while True:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            checked.append(worker)
+            if not worker.ping():
+                worker.restart()
+                restarted += 1
+        for worker in checked:
+            self.idle.put(worker)
+        return restarted
+
+    def health_check_loop(self, interval):
+        while not self.closed.wait(interval):
+            self.health_check()
+
+    def close(self):
+        self.closed.set()
+        for worker in self.workers:
+            worker.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+prolog_pool = None
+prolog_pool_lock = threading.Lock()
+
+def get_prolog_pool():
+    global prolog_pool
+    with prolog_pool_lock:
+        if prolog_pool is None:
+            prolog_pool = PrologWorkerPool()
+            atexit.register(prolog_pool.close)
+        return prolog_pool
+
+def run_prolog_query(prolog_code, query, timeout=None):
+    if query.endswith('.'):
+        query = query[:-1]
+    try:
+        return get_prolog_pool().run(prolog_code, query, timeout)
+    except Exception as e:
         return {"success": False, "error": str(e)}
 
+def run_prolog_batch(prolog_code, queries, limit=None, timeout=None):
+    queries = [query[:-1] if query.endswith('.') else query for query in queries]
+    try:
+        return get_prolog_pool().batch(prolog_code, queries, limit, timeout)
+    except Exception as e:
+        return [{"query": query, "success": False, "solutions": [], "error": str(e)} for query in queries]
+
 def main():
     user_query = input("What would you like to express in Prolog? ")
     print("Translating to Prolog...")
@@ -0,0 +1,11 @@
+import importlib.util
+import os
+
+import pytest
+
+@pytest.fixture(scope="session")
+def task2():
+    spec = importlib.util.spec_from_file_location("task2", os.path.join(os.path.dirname(__file__), "Task-2.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+class StubServer:
+    def __init__(self, delay=0.05, rate_limited=0, retry_after="0"):
+        self.delay = delay
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+        self.requests = 0
+        self.active = 0
+        self.peak = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/v1"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = json.loads(await reader.readexactly(int(headers.get("content-length") or 0)))
+                writer.write(await self.respond(body))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, body):
+        self.requests += 1
+        if self.rate_limited:
+            self.rate_limited -= 1
+            return self.encode(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}, {"Retry-After": self.retry_after})
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        query = body["messages"][-1]["content"].rsplit(": ", 1)[-1]
+        return self.encode(200, {
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": f"answer('{query}')."}, "finish_reason": "stop"}]
+        })
+
+    @staticmethod
+    def encode(status, payload, extra=None):
+        body = json.dumps(payload).encode()
+        lines = [f"HTTP/1.1 {status} {'OK' if status == 200 else 'Too Many Requests'}", "Content-Type: application/json", f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in (extra or {}).items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+@pytest.fixture
+def cache(task2, tmp_path):
+    return task2.TranslationCache(path=str(tmp_path / "translations.sqlite3"))
+
+def translate(task2, stub, queries, cache, **options):
+    async def run():
+        base_url = await stub.start()
+        try:
+            async with task2.AsyncTranslationClient(api_key="test", base_url=base_url, cache=cache, **options) as client:
+                return await client.translate_many(queries)
+        finally:
+            await stub.stop()
+    if not task2.ASYNC_OPENAI_AVAILABLE:
+        pytest.skip("the openai package is not installed")
+    return asyncio.run(run())
+
+def test_concurrency_is_bounded_by_the_semaphore(task2, cache):
+    stub = StubServer(delay=0.1)
+    results = translate(task2, stub, [f"query {i}" for i in range(12)], cache, max_concurrency=3)
+    assert all(result["success"] for result in results)
+    assert [result["prolog_code"] for result in results] == [f"answer('query {i}')." for i in range(12)]
+    assert stub.peak == 3
+
+def test_rate_limited_requests_are_retried(task2, cache):
+    stub = StubServer(rate_limited=2)
+    results = translate(task2, stub, ["parent of bob"], cache, base_delay=0.01)
+    assert results[0]["success"] is True
+    assert results[0]["attempts"] == 3
+    assert stub.requests == 3
+
+def test_rate_limit_gives_up_after_max_retries(task2, cache):
+    stub = StubServer(rate_limited=10)
+    results = translate(task2, stub, ["parent of bob"], cache, max_retries=2, base_delay=0.01)
+    assert results[0]["success"] is False
+    assert results[0]["status_code"] == 429
+    assert results[0]["attempts"] == 3
+    assert stub.requests == 3
+
+def test_cached_translations_skip_the_api(task2, cache):
+    stub = StubServer()
+    first = translate(task2, stub, ["parent of bob", "parent of ann"], cache)
+    second = translate(task2, stub, ["parent of bob", "parent  of ann"], cache)
+    assert [result["cached"] for result in first] == [False, False]
+    assert [result["cached"] for result in second] == [True, True]
+    assert [result["prolog_code"] for result in second] == [result["prolog_code"] for result in first]
+    assert stub.requests == 2
+
+def test_cache_is_used_off_the_event_loop(task2, cache):
+    loop_thread = threading.get_ident()
+    threads = []
+    get, put = cache.get, cache.put
+    cache.get = lambda key: threads.append(threading.get_ident()) or get(key)
+    cache.put = lambda key, code: threads.append(threading.get_ident()) or put(key, code)
+    translate(task2, StubServer(), ["parent of bob"], cache)
+    assert len(threads) == 2
+    assert loop_thread not in threads
@@ -0,0 +1,60 @@
+import shutil
+
+import pytest
+
+pytestmark = pytest.mark.skipif(shutil.which("swipl") is None, reason="swipl is not installed")
+
+FAMILY = """
+parent(tom, bob).
+parent(bob, ann).
+grandparent(X, Z) :- parent(X, Y), parent(Y, Z).
+"""
+
+@pytest.fixture
+def cache(task2, tmp_path):
+    return task2.CompiledProgramCache(cache_dir=str(tmp_path))
+
+@pytest.fixture
+def pool(task2, cache):
+    pool = task2.PrologWorkerPool(size=2, timeout=10, cache=cache)
+    yield pool
+    pool.close()
+
+def test_first_load_compiles_and_other_workers_hit(pool, cache, tmp_path):
+    assert pool.run(FAMILY, "grandparent(tom, ann)")["success"] is True
+    assert (cache.stats()["misses"], cache.stats()["hits"]) == (1, 0)
+    assert len(list(tmp_path.glob("*.qlf"))) == 1
+    assert pool.run(FAMILY, "grandparent(tom, ann)")["success"] is True
+    assert (cache.stats()["misses"], cache.stats()["hits"]) == (1, 1)
+
+def test_changed_program_is_compiled_again(pool, cache, tmp_path):
+    assert pool.run(FAMILY, "grandparent(bob, joe)")["success"] is False
+    assert pool.run(FAMILY + "parent(ann, joe).\n", "grandparent(bob, joe)")["success"] is True
+    assert cache.stats()["misses"] == 2
+    assert len(list(tmp_path.glob("*.qlf"))) == 2
+
+def test_eviction_keeps_the_program_being_loaded(task2, tmp_path):
+    cache = task2.CompiledProgramCache(cache_dir=str(tmp_path), max_bytes=1)
+    pool = task2.PrologWorkerPool(size=1, timeout=10, cache=cache)
+    try:
+        assert pool.run(FAMILY, "grandparent(tom, ann)")["success"] is True
+        assert pool.run(FAMILY + "parent(ann, joe).\n", "grandparent(bob, joe)")["success"] is True
+        assert cache.stats()["evictions"] == 1
+        assert len(list(tmp_path.glob("*.qlf"))) == 1
+    finally:
+        pool.close()
+
+def test_looping_directive_times_out_without_leaving_files(pool, cache, tmp_path):
+    result = pool.run("loop :- loop.\n:- loop.\n", "true", timeout=1)
+    assert result["success"] is False
+    assert "timed out" in result["error"]
+    assert list(tmp_path.iterdir()) == []
+    assert cache.stats()["uncacheable"] == 0
+    assert pool.run(FAMILY, "grandparent(tom, ann)")["success"] is True
+
+def test_program_with_errors_is_not_cached(pool, cache, tmp_path):
+    result = pool.run("broken(:- .\n", "true")
+    assert result["success"] is False
+    assert "error" in result
+    assert cache.stats()["uncacheable"] == 1
+    assert list(tmp_path.glob("*.qlf")) == []
@@ -0,0 +1,49 @@
+import shutil
+
+import pytest
+
+pytestmark = pytest.mark.skipif(shutil.which("swipl") is None, reason="swipl is not installed")
+
+FAMILY = """
+parent(tom, bob).
+parent(bob, ann).
+grandparent(X, Z) :- parent(X, Y), parent(Y, Z).
+"""
+COUNTER = """
+:- dynamic counter/1.
+counter(0).
+"""
+
+@pytest.fixture
+def pool(task2):
+    pool = task2.PrologWorkerPool(size=1, timeout=10, cache=False)
+    yield pool
+    pool.close()
+
+def test_repeated_queries_return_the_same_answer(pool):
+    for _ in range(5):
+        assert pool.run(FAMILY, "grandparent(tom, ann)") == {"success": True, "output": ""}
+        assert pool.run(FAMILY, "grandparent(ann, tom)")["success"] is False
+        assert pool.run(FAMILY, "grandparent(tom, X), format('~w~n', [X])") == {"success": True, "output": "ann"}
+
+def test_timed_out_query_restarts_the_worker(pool):
+    pid = pool.workers[0].process.pid
+    result = pool.run("loop :- loop.", "loop", timeout=0.5)
+    assert result["success"] is False
+    assert "timed out" in result["error"]
+    assert pool.workers[0].process.pid != pid
+    assert pool.run(FAMILY, "grandparent(tom, ann)")["success"] is True
+
+def test_assert_and_retract_do_not_leak_between_queries(pool):
+    for _ in range(3):
+        assert pool.run(COUNTER, "retract(counter(0)), assertz(counter(1))")["success"] is True
+        assert pool.run(COUNTER, "\\+ catch(marker, _, fail), assertz(marker)")["success"] is True
+
+def test_global_variables_do_not_leak_between_queries(pool):
+    for _ in range(3):
+        assert pool.run(COUNTER, "\\+ nb_current(seen, _), nb_setval(seen, true)")["success"] is True
+
+def test_batch_goals_are_isolated_from_each_other(pool):
+    goals = ["retract(counter(0)), assertz(counter(1))"] * 3
+    assert [result["success"] for result in pool.batch(COUNTER, goals)] == [True, True, True]
+    assert pool.run(COUNTER, "counter(0)")["success"] is True
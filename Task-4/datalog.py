@@ -0,0 +1,939 @@
+import heapq
+import os
+import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+from kb_snapshot import NO_SOURCE, SymbolTable, open_snapshot, save_snapshot
+
+try:
+    import numpy as np
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+class Columns:
+    def __init__(self, arity):
+        self.arity = arity
+        self.columns = [array('i') for _ in range(arity)]
+        self.alive = bytearray()
+        self.live = 0
+        self.sorted_rows = [array('i') for _ in range(arity)]
+        self.sorted_facts = array('i')
+        self.indexed = 0
+        self.pending = {}
+        self.pending_buckets = [{} for _ in range(arity)]
+        self.mapped = False
+
+    def thaw(self):
+        columns = []
+        for column in self.columns:
+            columns.append(array('i'))
+            columns[-1].frombytes(column.cast('B'))
+        self.columns = columns
+        self.alive = bytearray(self.alive)
+        self.mapped = False
+
+    def span(self, pattern):
+        best = None
+        for position, value in enumerate(pattern):
+            if value is not None:
+                rows, key = self.sorted_rows[position], self.columns[position].__getitem__
+                low = bisect_left(rows, value, key=key)
+                high = bisect_right(rows, value, low, key=key)
+                if best is None or high - low < best[2] - best[1]:
+                    best = (position, low, high)
+                    if low == high:
+                        break
+        return best
+
+    def locate(self, ids):
+        row = self.pending.get(ids)
+        if row is not None:
+            return row
+        rows = self.sorted_facts
+        low, high = 0, self.indexed
+        for column, value in zip(self.columns, ids):
+            low = bisect_left(rows, value, low, high, key=column.__getitem__)
+            high = bisect_right(rows, value, low, high, key=column.__getitem__)
+            if low == high:
+                return None
+        return next((rows[i] for i in range(low, high) if self.alive[rows[i]]), None)
+
+    def add(self, ids):
+        if self.locate(ids) is not None:
+            return False
+        if self.mapped:
+            self.thaw()
+        row = len(self.alive)
+        for column, value in zip(self.columns, ids):
+            column.append(value)
+        self.alive.append(1)
+        self.live += 1
+        self.pending[ids] = row
+        for buckets, value in zip(self.pending_buckets, ids):
+            bucket = buckets.get(value)
+            if bucket is None:
+                bucket = buckets[value] = array('i')
+            bucket.append(row)
+        if len(self.pending) >= max(1024, self.indexed // 2):
+            self.compact()
+        return True
+
+    def remove(self, ids):
+        row = self.locate(ids)
+        if row is None:
+            return False
+        if self.mapped:
+            self.thaw()
+        self.alive[row] = 0
+        self.live -= 1
+        self.pending.pop(ids, None)
+        dead = len(self.alive) - self.live
+        if dead >= 1024 and dead > self.live:
+            self.compact()
+        return True
+
+    def compact(self):
+        if self.live != len(self.alive):
+            keep = [row for row, alive in enumerate(self.alive) if alive]
+            self.columns = [array('i', (column[row] for row in keep)) for column in self.columns]
+            self.alive = bytearray(b'\x01') * len(keep)
+        rows = len(self.alive)
+        self.sorted_rows = [array('i', sorted(range(rows), key=column.__getitem__)) for column in self.columns]
+        if self.arity == 1:
+            self.sorted_facts = self.sorted_rows[0]
+        else:
+            order = list(range(rows))
+            for column in reversed(self.columns):
+                order.sort(key=column.__getitem__)
+            self.sorted_facts = array('i', order)
+        self.indexed = rows
+        self.pending = {}
+        self.pending_buckets = [{} for _ in range(self.arity)]
+
+    def match(self, pattern, symbols):
+        if None not in pattern:
+            if self.locate(pattern) is not None:
+                yield tuple(symbols[value] for value in pattern)
+            return
+        columns, alive, indexed, total = self.columns, self.alive, self.indexed, len(self.alive)
+        bound = [(columns[position], value) for position, value in enumerate(pattern) if value is not None]
+        if bound:
+            position, low, high = self.span(pattern)
+            candidates = self.sorted_rows[position][low:high]
+            checks = [(columns[other], value) for other, value in enumerate(pattern) if value is not None and other != position]
+            added = min((self.pending_buckets[position].get(value, ()) for position, value in enumerate(pattern) if value is not None), key=len)
+        else:
+            candidates = range(indexed)
+            checks = []
+            added = range(indexed, total)
+        for row in candidates:
+            if alive[row] and all(column[row] == value for column, value in checks):
+                yield tuple(symbols[column[row]] for column in columns)
+        for row in added:
+            if alive[row] and all(column[row] == value for column, value in bound):
+                yield tuple(symbols[column[row]] for column in columns)
+
+class ColumnarKB:
+    def __init__(self, facts=()):
+        self.symbols = SymbolTable()
+        self.relations = {}
+        for fact in facts:
+            self.add(fact)
+        self.compact()
+
+    def encode(self, values):
+        ids = tuple(self.symbols.lookup(value) for value in values)
+        return None if None in ids else ids
+
+    def add(self, fact):
+        predicate, arity = fact[0], len(fact) - 1
+        relation = self.relations.get((predicate, arity))
+        if relation is None:
+            relation = self.relations[(predicate, arity)] = Columns(arity)
+        intern = self.symbols.intern
+        return relation.add(tuple([intern(value) for value in fact[1:]]))
+
+    def remove(self, fact):
+        relation = self.relations.get((fact[0], len(fact) - 1))
+        ids = self.encode(fact[1:])
+        return relation is not None and ids is not None and relation.remove(ids)
+
+    def __contains__(self, fact):
+        relation = self.relations.get((fact[0], len(fact) - 1))
+        ids = self.encode(fact[1:])
+        return relation is not None and ids is not None and relation.locate(ids) is not None
+
+    def compact(self):
+        for relation in self.relations.values():
+            if relation.pending or relation.live != len(relation.alive):
+                relation.compact()
+
+    def __len__(self):
+        return sum(relation.live for relation in self.relations.values())
+
+    def __iter__(self):
+        for (predicate, arity), relation in list(self.relations.items()):
+            for args in relation.match((None,) * arity, self.symbols.symbols):
+                yield (predicate,) + args
+
+    def match(self, predicate, pattern):
+        relation = self.relations.get((predicate, len(pattern)))
+        if relation is None:
+            return ()
+        ids = []
+        for value in pattern:
+            if value is not None:
+                value = self.symbols.lookup(value)
+                if value is None:
+                    return ()
+            ids.append(value)
+        return relation.match(tuple(ids), self.symbols.symbols)
+
+    def save(self, path, source=NO_SOURCE):
+        self.compact()
+        relations = [(predicate, relation.live, relation.columns, relation.sorted_rows, relation.sorted_facts)
+                     for (predicate, _), relation in self.relations.items() if relation.live]
+        save_snapshot(path, [self.symbols.symbols[symbol_id] for symbol_id in range(len(self.symbols))], relations, source)
+
+    @classmethod
+    def open(cls, path, source=None):
+        symbols, relations, mapping = open_snapshot(path, source)
+        kb = cls()
+        kb.symbols = symbols
+        for predicate, rows, columns, sorted_rows, sorted_facts in relations:
+            relation = kb.relations[(predicate, len(columns))] = Columns(len(columns))
+            relation.alive = b'\x01' * rows
+            relation.columns = columns
+            relation.sorted_rows = sorted_rows
+            relation.sorted_facts = sorted_facts
+            relation.live = relation.indexed = rows
+            relation.mapped = True
+        kb.mapping = mapping
+        return kb
+
+BUILTINS = {
+    '\\=': lambda left, right: left != right,
+    '\\==': lambda left, right: left != right,
+    '==': lambda left, right: left == right,
+}
+
+def is_variable(term):
+    return isinstance(term, str) and (term[:1].isupper() or term[:1] == '_')
+
+class Step:
+    def __init__(self, literal, bound):
+        self.predicate = literal[0]
+        self.builtin = BUILTINS.get(self.predicate)
+        self.arity = len(literal) - 1
+        self.constants = []
+        self.inputs = []
+        self.outputs = []
+        self.repeats = []
+        first_seen = {}
+        for position, term in enumerate(literal[1:]):
+            if not is_variable(term):
+                self.constants.append((position, term))
+            elif term in bound:
+                self.inputs.append((position, term))
+            elif term in first_seen:
+                self.repeats.append((first_seen[term], position))
+            else:
+                first_seen[term] = position
+                self.outputs.append((position, term))
+
+class Rule:
+    def __init__(self, head, body):
+        self.head = tuple(head)
+        self.body = [tuple(literal) for literal in body]
+        self.plans = {}
+        body_variables = {term for literal in self.body if literal[0] not in BUILTINS for term in literal[1:] if is_variable(term)}
+        unsafe = [term for literal in [self.head] + self.body for term in literal[1:] if is_variable(term) and term not in body_variables]
+        if unsafe:
+            raise ValueError(f"Unsafe rule for {self.head[0]}: variable {unsafe[0]} is not bound by the body")
+
+    def __repr__(self):
+        return f"{format_literal(self.head)} :- {', '.join(format_literal(literal) for literal in self.body)}."
+
+def format_literal(literal):
+    if literal[0] in BUILTINS:
+        return f"{literal[1]} {literal[0]} {literal[2]}"
+    return f"{literal[0]}({', '.join(literal[1:])})"
+
+class Table:
+    def __init__(self):
+        self.answers = {}
+        self.consumers = set()
+        self.complete = False
+
+class Program:
+    def __init__(self, kb, rules=(), tabled=()):
+        self.kb = kb
+        self.rules = {}
+        self.tabled = set(tabled)
+        self.recursive = None
+        self.tables = {}
+        self.evaluating = None
+        self.worklist = []
+        self.queued = set()
+        self.order = {}
+        self.bulk = False
+        self.matrices = None
+        for head, body in rules:
+            self.add_rule(head, body)
+
+    def add_rule(self, head, body):
+        rule = Rule(head, body)
+        self.rules.setdefault(rule.head[0], []).append(rule)
+        self.recursive = None
+        self.tables.clear()
+        self.matrices = None
+        return rule
+
+    def table(self, predicate):
+        self.tabled.add(predicate)
+
+    def add_fact(self, fact):
+        self.tables.clear()
+        self.matrices = None
+        return self.kb.add(fact)
+
+    def remove_fact(self, fact):
+        self.tables.clear()
+        self.matrices = None
+        return self.kb.remove(fact)
+
+    def recursive_predicates(self):
+        if self.recursive is None:
+            calls = {predicate: {literal[0] for rule in rules for literal in rule.body if literal[0] in self.rules}
+                     for predicate, rules in self.rules.items()}
+            self.recursive = set()
+            for predicate in calls:
+                reached, frontier = set(), list(calls[predicate])
+                while frontier:
+                    callee = frontier.pop()
+                    if callee not in reached:
+                        reached.add(callee)
+                        frontier.extend(calls[callee])
+                if predicate in reached:
+                    self.recursive.add(predicate)
+        return self.recursive
+
+    def plan(self, body, bound):
+        bound = set(bound)
+        remaining = list(body)
+        steps = []
+        while remaining:
+            best, best_score = None, None
+            for literal in remaining:
+                variables = [term for term in literal[1:] if is_variable(term)]
+                if literal[0] in BUILTINS:
+                    score = (3, 0, 0) if all(term in bound for term in variables) else None
+                else:
+                    bound_count = sum(1 for term in literal[1:] if not is_variable(term) or term in bound)
+                    score = (2 if bound_count == len(literal) - 1 else 1, bound_count, 0 if literal[0] in self.rules else 1)
+                if score is not None and (best_score is None or score > best_score):
+                    best, best_score = literal, score
+            if best is None:
+                raise ValueError(f"Cannot order {format_literal(remaining[0])}: its variables are never bound")
+            steps.append(Step(best, bound))
+            bound.update(term for term in best[1:] if is_variable(term))
+            remaining.remove(best)
+        return steps
+
+    def solve(self, predicate, pattern):
+        rules = self.rules.get(predicate)
+        if rules is None:
+            yield from self.kb.match(predicate, pattern)
+            return
+        if predicate in self.tabled or predicate in self.recursive_predicates():
+            yield from self.solve_tabled(predicate, tuple(pattern))
+            return
+        seen = set()
+        for rule in rules:
+            for answer in self.derive(rule, pattern):
+                if answer not in seen:
+                    seen.add(answer)
+                    yield answer
+
+    def solve_tabled(self, predicate, pattern):
+        key = (predicate, pattern)
+        table = self.tables.get(key)
+        if self.evaluating is not None:
+            if table is None:
+                table = self.tables[key] = Table()
+                self.schedule(key)
+            if table.complete:
+                return table.answers
+            table.consumers.add(self.evaluating)
+            return list(table.answers)
+        if table is None or not table.complete:
+            table = self.complete_table(key)
+        return table.answers
+
+    def schedule(self, key):
+        if key not in self.order:
+            self.order[key] = len(self.order)
+        if key not in self.queued:
+            self.queued.add(key)
+            heapq.heappush(self.worklist, (-self.order[key], key))
+
+    def complete_table(self, key):
+        table = self.tables.setdefault(key, Table())
+        self.schedule(key)
+        try:
+            while self.worklist:
+                _, current = heapq.heappop(self.worklist)
+                self.queued.discard(current)
+                current_table = self.tables[current]
+                self.evaluating = current
+                try:
+                    answers = [answer for rule in self.rules[current[0]] for answer in self.derive(rule, current[1])]
+                finally:
+                    self.evaluating = None
+                grew = False
+                for answer in answers:
+                    if answer not in current_table.answers:
+                        current_table.answers[answer] = True
+                        grew = True
+                if grew:
+                    for consumer in current_table.consumers:
+                        self.schedule(consumer)
+            for member in self.order:
+                self.tables[member].complete = True
+                self.tables[member].consumers.clear()
+        except BaseException:
+            for member in self.order:
+                self.tables.pop(member, None)
+            raise
+        finally:
+            self.worklist.clear()
+            self.queued.clear()
+            self.order.clear()
+        return table
+
+    def derive(self, rule, pattern):
+        bindings = {}
+        for term, value in zip(rule.head[1:], pattern):
+            if value is None:
+                continue
+            if is_variable(term):
+                if bindings.setdefault(term, value) != value:
+                    return
+            elif term != value:
+                return
+        mode = frozenset(bindings)
+        plan = rule.plans.get(mode)
+        if plan is None:
+            plan = rule.plans[mode] = self.plan(rule.body, mode)
+        for solution in self.execute(plan, 0, bindings):
+            yield tuple(solution[term] if is_variable(term) else term for term in rule.head[1:])
+
+    def execute(self, plan, depth, bindings):
+        if depth == len(plan):
+            yield bindings
+            return
+        step = plan[depth]
+        pattern = [None] * step.arity
+        for position, value in step.constants:
+            pattern[position] = value
+        for position, term in step.inputs:
+            pattern[position] = bindings[term]
+        if step.builtin:
+            if step.builtin(*pattern):
+                yield from self.execute(plan, depth + 1, bindings)
+            return
+        for args in self.solve(step.predicate, tuple(pattern)):
+            if any(args[first] != args[position] for first, position in step.repeats):
+                continue
+            extended = dict(bindings)
+            for position, term in step.outputs:
+                extended[term] = args[position]
+            yield from self.execute(plan, depth + 1, extended)
+
+    def iter_query(self, predicate, args, limit=None):
+        if limit is not None and limit <= 0:
+            return
+        pattern = tuple(arg if isinstance(arg, str) else None for arg in args)
+        if self.bulk and SCIPY_AVAILABLE and pattern == (None, None) and predicate in self.rules and args[0].name != args[1].name:
+            if self.matrices is None:
+                self.matrices = MatrixEvaluator(self)
+            answers = self.matrices.pairs(predicate)
+        else:
+            answers = self.solve(predicate, pattern)
+        count = 0
+        for answer in answers:
+            result = {}
+            for arg, value in zip(args, answer):
+                if not isinstance(arg, str) and result.setdefault(arg.name, value) != value:
+                    break
+            else:
+                yield result
+                count += 1
+                if count == limit:
+                    return
+
+    def query(self, predicate, args, limit=None):
+        return list(self.iter_query(predicate, args, limit))
+
+    def exists(self, predicate, args):
+        return next(self.iter_query(predicate, args, 1), None) is not None
+
+def unify(literal, args, bindings=None):
+    bindings = {} if bindings is None else dict(bindings)
+    for term, value in zip(literal[1:], args):
+        if is_variable(term):
+            if bindings.setdefault(term, value) != value:
+                return None
+        elif term != value:
+            return None
+    return bindings
+
+class MatrixEvaluator:
+    def __init__(self, program):
+        self.program = program
+        kb = program.kb
+        self.columnar = isinstance(kb, ColumnarKB)
+        self.symbols = kb.symbols if self.columnar else SymbolTable()
+        if not self.columnar:
+            for fact in kb:
+                for value in fact[1:]:
+                    self.symbols.intern(value)
+        for rules in program.rules.values():
+            for rule in rules:
+                for literal in [rule.head] + rule.body:
+                    for term in literal[1:]:
+                        if not is_variable(term):
+                            self.symbols.intern(term)
+        self.size = len(self.symbols)
+        self.matrices = {}
+        self.masks = {}
+        self.chains = {}
+        self.evaluating = {}
+
+    def matrix(self, rows, cols):
+        return sparse.csr_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(self.size, self.size))
+
+    def diagonal(self, mask):
+        ids = np.flatnonzero(mask)
+        return self.matrix(ids, ids)
+
+    def edb_columns(self, predicate, arity):
+        relation = self.program.kb.relations.get((predicate, arity))
+        if relation is None or not relation.live:
+            return [np.zeros(0, dtype=np.intc)] * arity
+        alive = np.frombuffer(relation.alive, dtype=bool)
+        return [np.frombuffer(column, dtype=np.intc)[alive] for column in relation.columns]
+
+    def mask(self, predicate):
+        mask = self.masks.get(predicate)
+        if mask is None:
+            mask = np.zeros(self.size, dtype=bool)
+            if self.columnar and predicate not in self.program.rules:
+                mask[self.edb_columns(predicate, 1)[0]] = True
+            else:
+                mask[[self.symbols.lookup(answer[0]) for answer in self.program.solve(predicate, (None,))]] = True
+            self.masks[predicate] = mask
+        return mask
+
+    def relation(self, predicate):
+        matrix = self.evaluating.get(predicate)
+        if matrix is None:
+            matrix = self.matrices.get(predicate)
+        if matrix is not None:
+            return matrix
+        rules = self.program.rules.get(predicate)
+        if rules is None:
+            if self.columnar:
+                matrix = self.matrix(*self.edb_columns(predicate, 2))
+            else:
+                matrix = self.pairs_matrix(self.program.kb.match(predicate, (None, None)))
+        elif predicate in self.program.recursive_predicates():
+            matrix = self.fixpoint(predicate, rules)
+            if self.evaluating:
+                return matrix
+        else:
+            matrix = self.union(self.rule_matrix(rule) for rule in rules)
+        self.matrices[predicate] = matrix
+        return matrix
+
+    def fixpoint(self, predicate, rules):
+        matrix = self.evaluating[predicate] = self.matrix([], [])
+        try:
+            while True:
+                updated = self.union([matrix] + [self.rule_matrix(rule) for rule in rules])
+                if updated.nnz == matrix.nnz:
+                    return matrix
+                matrix = self.evaluating[predicate] = updated
+        finally:
+            del self.evaluating[predicate]
+
+    def union(self, matrices):
+        result = self.matrix([], [])
+        for matrix in matrices:
+            result = result + matrix
+        return result
+
+    def pairs_matrix(self, pairs):
+        lookup = self.symbols.lookup
+        rows, cols = [], []
+        for left, right in pairs:
+            rows.append(lookup(left))
+            cols.append(lookup(right))
+        return self.matrix(rows, cols)
+
+    def chain(self, rule):
+        if rule not in self.chains:
+            self.chains[rule] = self.compile_chain(rule)
+        return self.chains[rule]
+
+    def compile_chain(self, rule):
+        head = rule.head
+        if len(head) != 3 or not all(is_variable(term) for term in head[1:]) or head[1] == head[2]:
+            return None
+        source, target = head[1], head[2]
+        links, masks, distinct = [], {}, False
+        for literal in rule.body:
+            if not all(is_variable(term) for term in literal[1:]):
+                return None
+            if literal[0] in BUILTINS:
+                if literal[0] not in ('\\=', '\\==') or {literal[1], literal[2]} != {source, target}:
+                    return None
+                distinct = True
+            elif len(literal) == 2:
+                masks.setdefault(literal[1], []).append(literal[0])
+            elif len(literal) == 3 and literal[1] != literal[2]:
+                links.append(literal)
+            else:
+                return None
+        steps, current, visited = [], source, {source}
+        while current != target:
+            candidates = [literal for literal in links if current in literal[1:]]
+            if len(candidates) != 1:
+                return None
+            literal = candidates[0]
+            links.remove(literal)
+            forward = literal[1] == current
+            current = literal[2] if forward else literal[1]
+            if current in visited:
+                return None
+            visited.add(current)
+            steps.append((literal[0], forward, current))
+        if links or any(variable not in visited for variable in masks):
+            return None
+        return steps, masks, distinct
+
+    def rule_matrix(self, rule):
+        chain = self.chain(rule)
+        if chain is None:
+            return self.pairs_matrix(self.program.derive(rule, (None, None)))
+        steps, masks, distinct = chain
+        matrix = None
+        for predicate, forward, variable in steps:
+            link = self.relation(predicate)
+            link = link if forward else link.T.tocsr()
+            matrix = link if matrix is None else matrix @ link
+            for unary in masks.get(variable, ()):
+                matrix = matrix @ self.diagonal(self.mask(unary))
+        for unary in masks.get(rule.head[1], ()):
+            matrix = self.diagonal(self.mask(unary)) @ matrix
+        matrix = matrix.tocsr()
+        if distinct:
+            coo = matrix.tocoo()
+            keep = coo.row != coo.col
+            matrix = sparse.csr_matrix((coo.data[keep], (coo.row[keep], coo.col[keep])), shape=matrix.shape)
+        return matrix
+
+    def pairs(self, predicate):
+        matrix = self.relation(predicate).tocsr()
+        matrix.eliminate_zeros()
+        matrix.sort_indices()
+        coo = matrix.tocoo()
+        symbols = self.symbols.symbols
+        for row, col in zip(coo.row.tolist(), coo.col.tolist()):
+            yield symbols[row], symbols[col]
+
+class MaterializedProgram:
+    def __init__(self, program):
+        self.program = program
+        self.kb = program.kb
+        self.view = Program(self.kb)
+        self.plans = {}
+        self.base = {fact for fact in self.kb if fact[0] in program.rules}
+        self.materialize()
+
+    def materialize(self):
+        delta = {}
+        for fact in self.kb:
+            if fact[0] not in self.program.rules:
+                delta.setdefault(fact[0], []).append(fact[1:])
+        self.propagate(delta)
+
+    def dematerialize(self):
+        for fact in [fact for fact in self.kb if fact[0] in self.program.rules and fact not in self.base]:
+            self.kb.remove(fact)
+        compact = getattr(self.kb, "compact", None)
+        if compact is not None:
+            compact()
+        self.program.tables.clear()
+        self.program.matrices = None
+
+    def fire(self, delta):
+        for predicate, rules in self.program.rules.items():
+            for rule in rules:
+                for position, literal in enumerate(rule.body):
+                    if literal[0] in BUILTINS or literal[0] not in delta:
+                        continue
+                    for args in delta[literal[0]]:
+                        bindings = unify(literal, args)
+                        if bindings is None:
+                            continue
+                        key = (id(rule), position, frozenset(bindings))
+                        plan = self.plans.get(key)
+                        if plan is None:
+                            plan = self.plans[key] = self.view.plan(rule.body[:position] + rule.body[position + 1:], bindings)
+                        for solution in self.view.execute(plan, 0, bindings):
+                            yield (predicate,) + tuple(solution[term] if is_variable(term) else term for term in rule.head[1:])
+
+    def propagate(self, delta):
+        while delta:
+            derived = [fact for fact in self.fire(delta) if fact not in self.kb]
+            delta = {}
+            for fact in derived:
+                if self.kb.add(fact):
+                    delta.setdefault(fact[0], []).append(fact[1:])
+
+    def derivable(self, fact):
+        for rule in self.program.rules.get(fact[0], ()):
+            if next(self.view.derive(rule, fact[1:]), None) is not None:
+                return True
+        return False
+
+    def add_fact(self, fact):
+        if fact[0] in self.program.rules:
+            raise ValueError(f"{fact[0]} is a derived predicate")
+        if not self.kb.add(fact):
+            return False
+        self.propagate({fact[0]: [tuple(fact[1:])]})
+        return True
+
+    def remove_fact(self, fact):
+        if fact[0] in self.program.rules:
+            raise ValueError(f"{fact[0]} is a derived predicate")
+        fact = tuple(fact)
+        if fact not in self.kb:
+            return False
+        deleted = {fact}
+        frontier = {fact[0]: [fact[1:]]}
+        while frontier:
+            overdeleted = [derived for derived in self.fire(frontier) if derived in self.kb and derived not in deleted]
+            frontier = {}
+            for derived in overdeleted:
+                if derived not in deleted:
+                    deleted.add(derived)
+                    frontier.setdefault(derived[0], []).append(derived[1:])
+        for deleted_fact in deleted:
+            self.kb.remove(deleted_fact)
+        rederived = {}
+        for deleted_fact in deleted:
+            if deleted_fact[0] in self.program.rules and self.derivable(deleted_fact):
+                self.kb.add(deleted_fact)
+                rederived.setdefault(deleted_fact[0], []).append(deleted_fact[1:])
+        self.propagate(rederived)
+        return True
+
+    def iter_query(self, predicate, args, limit=None):
+        return self.view.iter_query(predicate, args, limit)
+
+    def query(self, predicate, args, limit=None):
+        return self.view.query(predicate, args, limit)
+
+    def exists(self, predicate, args):
+        return self.view.exists(predicate, args)
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>%.*)
+  | (?P<block>/\*)
+  | (?P<end>\.(?=\s|%|$))
+  | (?P<neck>:-)
+  | (?P<op>\\==|\\=|==)
+  | (?P<punct>[(),;/])
+  | (?P<quoted>'(?:[^'\\]|\\.|'')*')
+  | (?P<number>-?\d+(?:\.\d+)?)
+  | (?P<variable>[A-Z_][A-Za-z0-9_]*)
+  | (?P<name>[a-z][A-Za-z0-9_]*)
+""", re.VERBOSE)
+
+FACT_LINE = re.compile(r"\s*([a-z]\w*)\(\s*((?:[a-z]\w*|\d+)(?:\s*,\s*(?:[a-z]\w*|\d+))*)\s*\)\.\s*(?:%.*)?$")
+
+QUOTED_ESCAPES = {"n": "\n", "t": "\t", "\\": "\\", "'": "'"}
+
+def tokenize(lines, filename="<string>"):
+    in_block = False
+    at_boundary = True
+    for lineno, line in enumerate(lines, 1):
+        if at_boundary and not in_block:
+            fact = FACT_LINE.match(line)
+            if fact:
+                args = tuple(arg.strip() for arg in fact.group(2).split(","))
+                yield "fact", (fact.group(1),) + args, (filename, lineno, 1, line)
+                continue
+        position = 0
+        while position < len(line):
+            if in_block:
+                close = line.find("*/", position)
+                if close < 0:
+                    break
+                position = close + 2
+                in_block = False
+                continue
+            match = TOKEN_PATTERN.match(line, position)
+            if not match:
+                raise SyntaxError(f"Unexpected character {line[position]!r}", (filename, lineno, position + 1, line))
+            kind = match.lastgroup
+            position = match.end()
+            if kind == "block":
+                in_block = True
+            elif kind not in ("space", "comment"):
+                at_boundary = kind == "end"
+                yield kind, match.group(), (filename, lineno, match.start() + 1, line)
+
+def unquote(text):
+    body = text[1:-1].replace("''", "'")
+    return re.sub(r"\\(.)", lambda m: QUOTED_ESCAPES.get(m.group(1), m.group(1)), body)
+
+class ClauseParser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.current = next(tokens, None)
+        self.location = self.current[2] if self.current else ("<string>", 1, 1, "")
+        self.anonymous = 0
+        self.has_variables = False
+        self.has_variable_like_constants = False
+
+    def error(self, message):
+        raise SyntaxError(message, self.current[2] if self.current else self.location)
+
+    def advance(self):
+        token = self.current
+        self.location = token[2]
+        self.current = next(self.tokens, None)
+        return token
+
+    def expect(self, text):
+        if self.current is None or self.current[1] != text:
+            self.error(f"Expected {text!r}")
+        return self.advance()
+
+    def term(self):
+        if self.current is None:
+            self.error("Unexpected end of input")
+        kind, text, _ = self.advance()
+        if kind == "variable":
+            self.has_variables = True
+            if text == "_":
+                self.anonymous += 1
+                return f"_G{self.anonymous}"
+            return text
+        if kind == "quoted":
+            value = unquote(text)
+            if is_variable(value):
+                self.has_variable_like_constants = True
+            return value
+        if kind in ("name", "number"):
+            return text
+        self.error(f"Unexpected {text!r}")
+
+    def literal(self):
+        if self.current is not None and self.current[0] == "name":
+            name = self.advance()[1]
+            if self.current is None or self.current[1] != "(":
+                return (name,)
+            self.advance()
+            args = [self.term()]
+            while self.current is not None and self.current[1] == ",":
+                self.advance()
+                args.append(self.term())
+            self.expect(")")
+            return (name,) + tuple(args)
+        left = self.term()
+        if self.current is None or self.current[0] != "op":
+            self.error("Expected a comparison operator")
+        operator = self.advance()[1]
+        return (operator, left, self.term())
+
+    def body(self):
+        disjuncts = [[self.literal()]]
+        while self.current is not None and self.current[1] in (",", ";"):
+            if self.advance()[1] == ";":
+                disjuncts.append([])
+            disjuncts[-1].append(self.literal())
+        return disjuncts
+
+    def directive(self):
+        name = self.advance()[1]
+        specs = []
+        if name not in ("table", "dynamic", "discontiguous"):
+            while self.current is not None and self.current[0] != "end":
+                self.advance()
+            return name, specs
+        while self.current is not None and self.current[0] != "end":
+            if self.current[1] == ",":
+                self.advance()
+                continue
+            predicate = self.advance()[1]
+            self.expect("/")
+            specs.append((predicate, int(self.advance()[1])))
+        return name, specs
+
+    def clauses(self):
+        while self.current is not None:
+            self.anonymous = 0
+            self.has_variables = False
+            self.has_variable_like_constants = False
+            if self.current[0] == "fact":
+                yield ("fact", self.advance()[1])
+                continue
+            if self.current[0] == "neck":
+                self.advance()
+                yield ("directive",) + self.directive()
+            else:
+                head = self.literal()
+                if self.current is not None and self.current[0] == "neck":
+                    self.advance()
+                    bodies = self.body()
+                    if self.has_variable_like_constants:
+                        self.error(f"Rules for {head[0]}/{len(head) - 1} cannot use quoted constants that look like variables")
+                    for body in bodies:
+                        yield ("rule", head, body)
+                elif self.has_variables:
+                    self.error(f"Fact {head[0]}/{len(head) - 1} must be ground")
+                else:
+                    yield ("fact", head)
+            self.expect(".")
+
+def read_clauses(path):
+    with open(path) as f:
+        yield from ClauseParser(tokenize(f, path)).clauses()
+
+def load_program(path, program=None, facts=True):
+    if program is None:
+        program = Program(ColumnarKB())
+    for clause in read_clauses(path):
+        if clause[0] == "fact":
+            if facts:
+                program.kb.add(clause[1])
+        elif clause[0] == "rule":
+            program.add_rule(clause[1], clause[2])
+        elif clause[1] == "table":
+            for predicate, _ in clause[2]:
+                program.table(predicate)
+    compact = getattr(program.kb, "compact", None)
+    if compact is not None:
+        compact()
+    return program
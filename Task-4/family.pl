@@ -34,4 +34,8 @@ child(X, Y) :- parent(Y, X).
 son(X, Y) :- child(X, Y), male(X).
 daughter(X, Y) :- child(X, Y), female(X).
 grandparent(X, Z) :- parent(X, Y), parent(Y, Z).
-sibling(X, Y) :- parent(Z, X), parent(Z, Y), X \= Y.
\ No newline at end of file
+sibling(X, Y) :- parent(Z, X), parent(Z, Y), X \= Y.
+% Recursive rules, evaluated with tabling
+:- table ancestor/2.
+ancestor(X, Y) :- parent(X, Y) ; parent(X, Z), ancestor(Z, Y).
+descendant(X, Y) :- ancestor(Y, X).
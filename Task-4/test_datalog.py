@@ -0,0 +1,25 @@
+import random
+
+from datalog import ColumnarKB
+
+def test_pending_rows_match_like_compacted_rows():
+    random.seed(3)
+    base = {('parent', f'p{random.randrange(300)}', f'p{random.randrange(300)}') for _ in range(3000)}
+    kb = ColumnarKB(base)
+    added = {('parent', f'p{random.randrange(400)}', f'p{random.randrange(400)}') for _ in range(1000)} - base
+    for fact in added:
+        assert kb.add(fact)
+    removed = set(random.sample(sorted(added), 100)) | set(random.sample(sorted(base), 100))
+    for fact in removed:
+        assert kb.remove(fact)
+    assert any(relation.pending for relation in kb.relations.values())
+    facts = (base | added) - removed
+    patterns = [(f'p{random.randrange(400)}', None) for _ in range(50)] + [(None, f'p{random.randrange(400)}') for _ in range(50)]
+    patterns += [fact[1:] for fact in random.sample(sorted(facts), 20)] + [fact[1:] for fact in removed][:20] + [(None, None)]
+    def expected(pattern):
+        return sorted(fact[1:] for fact in facts if all(value is None or value == arg for value, arg in zip(pattern, fact[1:])))
+    for pattern in patterns:
+        assert sorted(kb.match('parent', pattern)) == expected(pattern)
+    kb.compact()
+    for pattern in patterns:
+        assert sorted(kb.match('parent', pattern)) == expected(pattern)
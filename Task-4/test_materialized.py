@@ -0,0 +1,90 @@
+import os
+import random
+
+import pytest
+
+from datalog import ColumnarKB, MaterializedProgram, Program, load_program
+
+FAMILY_PROGRAM_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'family.pl')
+PEOPLE = ['abraham', 'mona', 'homer', 'marge', 'bart', 'lisa', 'maggie', 'clancy', 'jackie', 'patty', 'selma', 'ling', 'herb', 'abbie']
+
+class Var:
+    def __init__(self, name):
+        self.name = name
+
+def answers(solver, predicate):
+    return sorted((answer['X'], answer['Y']) for answer in solver.iter_query(predicate, (Var('X'), Var('Y'))))
+
+def recomputed(materialized):
+    rules = materialized.program.rules
+    edb = [fact for fact in materialized.kb if fact[0] not in rules]
+    return load_program(FAMILY_PROGRAM_PATH, Program(ColumnarKB(edb)), facts=False)
+
+def assert_matches_full_recompute(materialized):
+    fresh = recomputed(materialized)
+    for predicate in materialized.program.rules:
+        assert answers(materialized, predicate) == answers(fresh, predicate), predicate
+
+@pytest.fixture
+def materialized():
+    return MaterializedProgram(load_program(FAMILY_PROGRAM_PATH))
+
+def test_initial_views_match_full_evaluation(materialized):
+    assert_matches_full_recompute(materialized)
+    assert ('abraham', 'bart') in answers(materialized, 'ancestor')
+
+def test_removing_a_link_retracts_transitive_ancestors(materialized):
+    assert materialized.remove_fact(('parent', 'homer', 'bart'))
+    assert ('abraham', 'bart') not in answers(materialized, 'ancestor')
+    assert ('marge', 'bart') in answers(materialized, 'mother')
+    assert_matches_full_recompute(materialized)
+    assert materialized.add_fact(('parent', 'homer', 'bart'))
+    assert ('abraham', 'bart') in answers(materialized, 'ancestor')
+    assert_matches_full_recompute(materialized)
+
+def test_facts_with_another_derivation_survive_removal(materialized):
+    assert ('bart', 'lisa') in answers(materialized, 'sibling')
+    assert materialized.remove_fact(('parent', 'homer', 'lisa'))
+    assert ('bart', 'lisa') in answers(materialized, 'sibling')
+    assert_matches_full_recompute(materialized)
+
+def test_derived_predicates_cannot_be_edited(materialized):
+    with pytest.raises(ValueError):
+        materialized.add_fact(('ancestor', 'bart', 'homer'))
+    with pytest.raises(ValueError):
+        materialized.remove_fact(('father', 'homer', 'bart'))
+
+def test_random_updates_match_full_recompute(materialized):
+    rng = random.Random(7)
+    for _ in range(60):
+        edb = [fact for fact in materialized.kb if fact[0] not in materialized.program.rules]
+        if edb and rng.random() < 0.4:
+            materialized.remove_fact(rng.choice(edb))
+        elif rng.random() < 0.7:
+            materialized.add_fact(('parent', rng.choice(PEOPLE), rng.choice(PEOPLE)))
+        else:
+            materialized.add_fact((rng.choice(['male', 'female']), rng.choice(PEOPLE)))
+        assert_matches_full_recompute(materialized)
+
+def test_dematerialize_leaves_only_base_facts(materialized):
+    base = set(load_program(FAMILY_PROGRAM_PATH).kb)
+    materialized.add_fact(('parent', 'bart', 'ling'))
+    materialized.dematerialize()
+    assert set(materialized.kb) == base | {('parent', 'bart', 'ling')}
+    program = materialized.program
+    program.add_fact(('male', 'bart'))
+    assert program.exists('father', ('bart', 'ling'))
+    assert program.exists('ancestor', ('abraham', 'ling'))
+
+def test_bulk_mode_after_materialized_views_drops_derived_rows():
+    import run_queries
+    facts = set(run_queries.kb)
+    try:
+        run_queries.use_materialized_views()
+        assert len(run_queries.kb) > len(facts)
+        run_queries.use_bulk_mode()
+        assert set(run_queries.kb) == facts
+        assert run_queries.exists(run_queries.find_all_ancestor, 'abraham', 'bart')
+    finally:
+        run_queries.family_program.bulk = False
+        run_queries.family_solver = run_queries.family_program
@@ -0,0 +1,53 @@
+import os
+import shutil
+
+from datalog import ColumnarKB, Program, load_program
+
+FAMILY_PROGRAM_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'family.pl')
+FACTS = [('parent', 'homer', 'bart'), ('parent', 'homer', 'lisa'), ('parent', 'marge', 'lisa'), ('male', 'homer'), ('likes', 'bart', 'zoë', 'skating')]
+
+def test_round_trip_preserves_facts_and_matches(tmp_path):
+    path = str(tmp_path / 'kb.snapshot')
+    kb = ColumnarKB(FACTS)
+    kb.remove(('parent', 'marge', 'lisa'))
+    kb.save(path)
+    loaded = ColumnarKB.open(path)
+    assert sorted(loaded) == sorted(kb)
+    assert len(loaded) == len(kb) == 4
+    for predicate, pattern in [('parent', ('homer', None)), ('parent', (None, 'lisa')), ('likes', (None, 'zoë', None)), ('male', ('bart',)), ('parent', ('ned', None))]:
+        assert sorted(loaded.match(predicate, pattern)) == sorted(kb.match(predicate, pattern))
+    assert ('parent', 'marge', 'lisa') not in loaded
+
+def test_loaded_snapshot_accepts_updates(tmp_path):
+    path = str(tmp_path / 'kb.snapshot')
+    ColumnarKB(FACTS).save(path)
+    loaded = ColumnarKB.open(path)
+    assert loaded.add(('parent', 'bart', 'ling'))
+    assert not loaded.add(('parent', 'homer', 'bart'))
+    assert loaded.remove(('parent', 'homer', 'lisa'))
+    assert sorted(loaded.match('parent', (None, None))) == [('bart', 'ling'), ('homer', 'bart'), ('marge', 'lisa')]
+    loaded.save(path)
+    assert sorted(ColumnarKB.open(path)) == sorted(loaded)
+
+def test_family_program_answers_the_same_from_a_snapshot(tmp_path):
+    path = str(tmp_path / 'family.snapshot')
+    program = load_program(FAMILY_PROGRAM_PATH)
+    program.kb.save(path)
+    restored = load_program(FAMILY_PROGRAM_PATH, Program(ColumnarKB.open(path)), facts=False)
+    for predicate in ['father', 'sibling', 'ancestor']:
+        assert sorted(restored.solve(predicate, (None, None))) == sorted(program.solve(predicate, (None, None)))
+
+def test_stale_family_snapshot_is_ignored(tmp_path, monkeypatch, capsys):
+    import run_queries
+    source = str(tmp_path / 'family.pl')
+    shutil.copyfile(FAMILY_PROGRAM_PATH, source)
+    monkeypatch.setattr(run_queries, 'FAMILY_PROGRAM_PATH', source)
+    path = str(tmp_path / 'family.snapshot')
+    run_queries.save_snapshot(path)
+    assert hasattr(run_queries.load_family_program(path).kb, 'mapping')
+    with open(source, 'a') as f:
+        f.write('parent(bart, ling).\n')
+    program = run_queries.load_family_program(path)
+    assert not hasattr(program.kb, 'mapping')
+    assert ('parent', 'bart', 'ling') in program.kb
+    assert 'Ignoring snapshot' in capsys.readouterr().err
@@ -1,5 +1,67 @@
+import io
+import logging
+import os
+import multiprocessing
 import re
-from typing import Dict, Any
+import sys
+import threading
+from collections import OrderedDict
+from itertools import chain
+from typing import Dict, Any, Iterable, Iterator, List
+
+GROUP_SYNTAX = re.compile(r"\\(?![0-7]{3})([1-9][0-9]?)|\(\?P<([^>]*)>|\(\?P=([^)]*)\)|\(\?\(([^)]*)\)|\((?!\?)")
+CLASS_START = re.compile(r"\[\^?\]?")
+
+def name_groups(pattern, prefix):
+    parts = []
+    aliases = {}
+    groups = 0
+    position = 0
+    def reference(name):
+        index = int(name) if name.isdigit() else aliases.get(name)
+        if index is None or not 1 <= index <= groups:
+            raise ValueError(f"Template pattern {pattern!r} refers to undefined group {name!r}")
+        return f"{prefix}{index}"
+    while position < len(pattern):
+        char = pattern[position]
+        if char == "[":
+            end = CLASS_START.match(pattern, position).end()
+            while end < len(pattern) and pattern[end] != "]":
+                end += 2 if pattern[end] == "\\" else 1
+            parts.append(pattern[position:end + 1])
+            position = end + 1
+            continue
+        match = GROUP_SYNTAX.match(pattern, position)
+        if match is None:
+            step = 2 if char == "\\" else 1
+            parts.append(pattern[position:position + step])
+            position += step
+            continue
+        number, name, named_reference, condition = match.groups()
+        if number is not None:
+            parts.append(f"(?P={reference(number)})")
+        elif named_reference is not None:
+            parts.append(f"(?P={reference(named_reference)})")
+        elif condition is not None:
+            parts.append(f"(?({reference(condition)})")
+        else:
+            if name is not None:
+                if not name.isidentifier() or name in aliases:
+                    raise ValueError(f"Template pattern {pattern!r} has an invalid or repeated group name {name!r}")
+                aliases[name] = groups + 1
+            groups += 1
+            parts.append(f"(?P<{prefix}{groups}>")
+        position = match.end()
+    return "".join(parts), aliases
+
+class TemplateMatch:
+    def __init__(self, match, template_index, aliases):
+        self.match = match
+        self.name = f"t{template_index}"
+        self.aliases = aliases
+
+    def group(self, index=0):
+        return self.match.group(self.name if index == 0 else f"{self.name}_{self.aliases.get(index, index)}")
 
 class ProblemFormulator:
     def __init__(self):
@@ -55,24 +117,40 @@ class ProblemFormulator:
                 "args": [lambda m: m.group(1), lambda m: m.group(2)]
             }
         ]
+        self.compiled = None
+        self.aliases = []
+        self.compiled_count = 0
     
+    def dispatcher(self):
+        if self.compiled is None or self.compiled_count != len(self.templates):
+            named = [name_groups(template['pattern'], f't{i}_') for i, template in enumerate(self.templates)]
+            self.compiled = re.compile("|".join(f"(?P<t{i}>{pattern})" for i, (pattern, _) in enumerate(named)), re.IGNORECASE)
+            self.aliases = [aliases for _, aliases in named]
+            self.compiled_count = len(self.templates)
+        return self.compiled
+
     def formulate(self, question: str) -> Dict[str, Any]:
-        for template in self.templates:
-            match = re.match(template["pattern"], question, re.IGNORECASE)
-            if match:
-                args = [arg_extractor(match) for arg_extractor in template["args"]]
-                formulation = {
-                    "predicate": template["predicate"],
-                    "args": args,
-                    "query_type": "boolean" if all(isinstance(arg, str) for arg in args) else "wh-question"
-                }
-                return formulation
+        match = self.dispatcher().match(question)
+        if match:
+            template_index = int(match.lastgroup[1:])
+            template = self.templates[template_index]
+            match = TemplateMatch(match, template_index, self.aliases[template_index])
+            args = [arg_extractor(match) for arg_extractor in template["args"]]
+            formulation = {
+                "predicate": template["predicate"],
+                "args": args,
+                "query_type": "boolean" if all(isinstance(arg, str) for arg in args) else "wh-question"
+            }
+            return formulation
         return {
             "predicate": None,
             "args": [],
             "query_type": None
         }
 
+    def formulate_many(self, questions: Iterable[str]) -> List[Dict[str, Any]]:
+        return [self.formulate(question) for question in questions]
+
 class SymbolicReasoner:
     def __init__(self, knowledge_base, query_handlers):
         self.knowledge_base = knowledge_base
@@ -97,71 +175,96 @@ class SymbolicReasoner:
         except Exception as e:
             return {"results": [], "error": str(e)}
 
+def write_lines(lines: Iterable[str], out, buffer_size: int = 65536) -> int:
+    if hasattr(out, "sendall"):
+        send = lambda chunk: out.sendall(chunk.encode('utf-8'))
+    elif isinstance(out, io.TextIOBase):
+        send = out.write
+    else:
+        send = lambda chunk: out.write(chunk.encode('utf-8'))
+    buffered, size, written = [], 0, 0
+    for line in lines:
+        buffered.append(line)
+        buffered.append("\n")
+        size += len(line) + 1
+        written += 1
+        if size >= buffer_size:
+            send("".join(buffered))
+            buffered, size = [], 0
+    if buffered:
+        send("".join(buffered))
+    return written
+
 class ResultInterpreter:
+    def __init__(self):
+        self.phrases = {
+            "father": "is the father of",
+            "mother": "is the mother of",
+            "child": "is a child of",
+            "grandparent": "is a grandparent of",
+            "sibling": "is a sibling of"
+        }
+        self.renderers = {}
+
     def interpret(self, reasoning_results: Dict[str, Any], formulation: Dict[str, Any]) -> str:
-        results = reasoning_results.get("results", [])
-        if not results:
+        return "\n".join(self.iter_interpret(reasoning_results, formulation))
+
+    def iter_interpret(self, reasoning_results: Dict[str, Any], formulation: Dict[str, Any]) -> Iterator[str]:
+        results = iter(reasoning_results.get("results", []))
+        first = next(results, None)
+        if first is None:
             error = reasoning_results.get("error")
             if error:
-                return f"Error: {error}"
+                yield f"Error: {error}"
+                return
             predicate = formulation.get("predicate", "")
             args = formulation.get("args", [])
             query_type = formulation.get("query_type", "")
             if query_type == "boolean":
-                return f"No, {args[0]} is not the {predicate} of {args[1]} based on the available information."
+                yield f"No, {args[0]} is not the {predicate} of {args[1]} based on the available information."
             else:
-                return f"I couldn't find any {predicate}s of {args[1]} based on the available information."
+                yield f"I couldn't find any {predicate}s of {args[1]} based on the available information."
+            return
         predicate = reasoning_results.get("predicate", "")
         args = reasoning_results.get("args", [])
         query_type = reasoning_results.get("query_type", "")
         if query_type == "boolean":
-            return f"Yes, {args[0]} is the {predicate} of {args[1]}."
-        responses = []
-        for result in results:
-            if not result:
-                responses.append("Yes, that is true.")
-            else:
-                var_arg_index = None
-                for i, arg in enumerate(args):
-                    if isinstance(arg, Var):
-                        var_arg_index = i
-                        break
-                if var_arg_index is not None:
-                    var_name = args[var_arg_index].name
-                    if var_name in result:
-                        value = result[var_name]
-                        if predicate == "father":
-                            if var_arg_index == 0:
-                                responses.append(f"{value} is the father of {args[1]}.")
-                            else:
-                                responses.append(f"{args[0]} is the father of {value}.")
-                        elif predicate == "mother":
-                            if var_arg_index == 0:
-                                responses.append(f"{value} is the mother of {args[1]}.")
-                            else:
-                                responses.append(f"{args[0]} is the mother of {value}.")
-                        elif predicate == "child":
-                            if var_arg_index == 0:
-                                responses.append(f"{value} is a child of {args[1]}.")
-                            else:
-                                responses.append(f"{args[0]} is a child of {value}.")
-                        elif predicate == "grandparent":
-                            if var_arg_index == 0:
-                                responses.append(f"{value} is a grandparent of {args[1]}.")
-                            else:
-                                responses.append(f"{args[0]} is a grandparent of {value}.")
-                        elif predicate == "sibling":
-                            if var_arg_index == 0:
-                                responses.append(f"{value} is a sibling of {args[1]}.")
-                            else:
-                                responses.append(f"{args[0]} is a sibling of {value}.")
-        if responses:
-            if len(responses) == 1:
-                return responses[0]
-            else:
-                return "\n".join(responses)
+            yield f"Yes, {args[0]} is the {predicate} of {args[1]}."
+            return
+        responded = False
+        render = self.renderer(predicate, args)
+        for result in chain([first], results):
+            response = render(result) if result else "Yes, that is true."
+            if response:
+                responded = True
+                yield response
+        if not responded:
+            yield "No specific results found based on the available information."
+
+    def renderer(self, predicate, args):
+        var_index = next((i for i, arg in enumerate(args) if isinstance(arg, Var)), None)
+        key = (predicate, var_index)
+        compiled = self.renderers.get(key)
+        if compiled is None:
+            compiled = self.renderers[key] = self.compile_renderer(predicate, var_index)
+        return compiled(args)
+
+    def compile_renderer(self, predicate, var_index):
+        phrase = self.phrases.get(predicate)
+        if phrase is None or var_index is None:
+            return lambda args: lambda result: None
+        if var_index == 0:
+            def bind(args):
+                name, suffix = args[0].name, f" {phrase} {args[1]}."
+                return lambda result: f"{result[name]}{suffix}" if name in result else None
         else:
-            return "No specific results found based on the available information."
+            def bind(args):
+                name, prefix = args[var_index].name, f"{args[0]} {phrase} "
+                return lambda result: f"{prefix}{result[name]}." if name in result else None
+        return bind
+
+    def write(self, reasoning_results: Dict[str, Any], formulation: Dict[str, Any], out, buffer_size: int = 65536) -> int:
+        return write_lines(self.iter_interpret(reasoning_results, formulation), out, buffer_size)
 
 class SelfRefiner:
     def refine(self, formulation: Dict[str, Any], error: str = None) -> Dict[str, Any]:
@@ -174,6 +277,101 @@ class Var:
     def __repr__(self):
         return f"_{self.name}"
 
+class KnowledgeBase(dict):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def pop(self, *args):
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self.version += 1
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+class AnswerCache:
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or int(os.getenv("ANSWER_CACHE_SIZE", "4096"))
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(formulation):
+        args = tuple(None if isinstance(arg, Var) else arg for arg in formulation.get("args", []))
+        return (formulation.get("predicate"), args, formulation.get("query_type"))
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self.entries[key]
+                self.stale += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, version, answer):
+        with self.lock:
+            self.entries[key] = (version, answer)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries)
+            }
+
+logger = logging.getLogger(__name__)
+pool_instance = None
+PARALLEL_MIN_QUESTIONS = int(os.getenv("LOGIC_LM_PARALLEL_MIN_QUESTIONS", "256"))
+
+def answer_in_worker(question):
+    return pool_instance.answer_question(question)
+
+def fork_is_safe():
+    return "fork" in multiprocessing.get_all_start_methods() and sys.platform != "darwin" and threading.active_count() == 1
+
 class LOGIC_LM:
     def __init__(self, knowledge_base):
         self.knowledge_base = knowledge_base
@@ -182,15 +380,93 @@ class LOGIC_LM:
         self.symbolic_reasoner = SymbolicReasoner(knowledge_base, self.query_handlers)
         self.result_interpreter = ResultInterpreter()
         self.self_refiner = SelfRefiner()
+        self.answer_cache = AnswerCache()
+
+    @property
+    def version(self):
+        return getattr(self.knowledge_base, "version", None)
+
+    def add_fact(self, fact):
+        if fact in self.knowledge_base:
+            return False
+        self.knowledge_base[fact] = True
+        return True
+
+    def remove_fact(self, fact):
+        if fact not in self.knowledge_base:
+            return False
+        del self.knowledge_base[fact]
+        return True
+
+    def cache_key(self, formulation):
+        if self.version is None:
+            return None
+        reasoner = self.symbolic_reasoner
+        return (reasoner, reasoner.predicate_solvers.get(formulation["predicate"])) + AnswerCache.key(formulation)
     
     def answer_question(self, question: str, max_refinements: int = 3) -> str:
         formulation = self.problem_formulator.formulate(question)
         if not formulation.get("predicate"):
             return "I don't understand that question. Could you rephrase it?"
+        key = self.cache_key(formulation)
+        version = self.version
+        answer = self.answer_cache.get(key, version) if key is not None else None
+        if answer is not None:
+            return answer
         reasoning_results = self.symbolic_reasoner.reason(formulation)
         refinement_count = 0
         while reasoning_results.get("error") and refinement_count < max_refinements:
             formulation = self.self_refiner.refine(formulation, reasoning_results.get("error"))
             reasoning_results = self.symbolic_reasoner.reason(formulation)
             refinement_count += 1
-        return self.result_interpreter.interpret(reasoning_results, formulation)
\ No newline at end of file
+        answer = self.result_interpreter.interpret(reasoning_results, formulation)
+        if key is not None and not reasoning_results.get("error"):
+            self.answer_cache.put(key, version, answer)
+        return answer
+
+    def stream_answer(self, question: str, max_refinements: int = 3) -> Iterator[str]:
+        formulation = self.problem_formulator.formulate(question)
+        if not formulation.get("predicate"):
+            yield "I don't understand that question. Could you rephrase it?"
+            return
+        key = self.cache_key(formulation)
+        version = self.version
+        answer = self.answer_cache.get(key, version) if key is not None else None
+        if answer is not None:
+            yield from answer.split("\n")
+            return
+        reasoning_results = self.symbolic_reasoner.reason(formulation)
+        refinement_count = 0
+        while reasoning_results.get("error") and refinement_count < max_refinements:
+            formulation = self.self_refiner.refine(formulation, reasoning_results.get("error"))
+            reasoning_results = self.symbolic_reasoner.reason(formulation)
+            refinement_count += 1
+        lines = []
+        for line in self.result_interpreter.iter_interpret(reasoning_results, formulation):
+            lines.append(line)
+            yield line
+        if key is not None and not reasoning_results.get("error"):
+            self.answer_cache.put(key, version, "\n".join(lines))
+
+    def write_answer(self, question: str, out, buffer_size: int = 65536) -> int:
+        return write_lines(self.stream_answer(question), out, buffer_size)
+
+    def answer_questions(self, questions: Iterable[str], workers: int = None, chunksize: int = 64) -> List[str]:
+        global pool_instance
+        questions = list(questions)
+        requested = workers
+        if workers is None:
+            workers = 1 if len(questions) < PARALLEL_MIN_QUESTIONS else os.cpu_count() or 1
+        workers = min(workers, -(-len(questions) // chunksize))
+        if workers > 1 and not fork_is_safe():
+            if requested is not None:
+                logger.warning("Answering %d questions serially instead of with %d workers: forking is not safe in this process (%d threads running)", len(questions), workers, threading.active_count())
+            workers = 1
+        if workers <= 1:
+            return [self.answer_question(question) for question in questions]
+        pool_instance = self
+        try:
+            with multiprocessing.get_context("fork").Pool(workers) as pool:
+                return list(pool.imap(answer_in_worker, questions, chunksize))
+        finally:
+            pool_instance = None
\ No newline at end of file
@@ -0,0 +1,47 @@
+from logic_lm_implementation import LOGIC_LM, KnowledgeBase, SymbolicReasoner
+
+def find_all_father(kb):
+    def solve(X, Y):
+        if isinstance(X, str) and isinstance(Y, str):
+            return [{}] if ('parent', X, Y) in kb and ('male', X) in kb else []
+        return [{X.name: key[1]} for key in list(kb) if key[0] == 'parent' and key[2] == Y and ('male', key[1]) in kb]
+    return solve
+
+def simpsons(kb):
+    logic_lm = LOGIC_LM(kb)
+    logic_lm.query_handlers = {"father": find_all_father(kb)}
+    logic_lm.symbolic_reasoner = SymbolicReasoner(kb, logic_lm.query_handlers)
+    return logic_lm
+
+FACTS = {('parent', 'homer', 'bart'): True, ('male', 'homer'): True}
+
+def test_direct_knowledge_base_edits_invalidate_cached_answers():
+    kb = KnowledgeBase(FACTS)
+    logic_lm = simpsons(kb)
+    assert logic_lm.answer_question("Who is the father of bart?") == "homer is the father of bart."
+    assert logic_lm.answer_question("Who is the father of bart?") == "homer is the father of bart."
+    assert logic_lm.answer_cache.stats()["hits"] == 1
+    del kb[('male', 'homer')]
+    kb[('parent', 'ned', 'bart')] = True
+    kb[('male', 'ned')] = True
+    assert logic_lm.answer_question("Who is the father of bart?") == "ned is the father of bart."
+    kb.update({('male', 'homer'): True})
+    assert sorted(logic_lm.answer_question("Who is the father of bart?").split("\n")) == ["homer is the father of bart.", "ned is the father of bart."]
+    assert logic_lm.remove_fact(('male', 'ned'))
+    assert logic_lm.answer_question("Who is the father of bart?") == "homer is the father of bart."
+
+def test_replacing_the_reasoner_invalidates_cached_answers():
+    kb = KnowledgeBase(FACTS)
+    logic_lm = simpsons(kb)
+    assert logic_lm.answer_question("Who is the father of bart?") == "homer is the father of bart."
+    logic_lm.query_handlers["father"] = lambda X, Y: [{X.name: 'abe'}]
+    assert logic_lm.answer_question("Who is the father of bart?") == "abe is the father of bart."
+    logic_lm.symbolic_reasoner = SymbolicReasoner(kb, {"father": find_all_father(kb)})
+    assert logic_lm.answer_question("Who is the father of bart?") == "homer is the father of bart."
+
+def test_plain_dict_knowledge_bases_are_not_cached():
+    kb = dict(FACTS)
+    logic_lm = simpsons(kb)
+    assert logic_lm.answer_question("Who is the father of bart?") == "homer is the father of bart."
+    del kb[('male', 'homer')]
+    assert logic_lm.answer_question("Who is the father of bart?") == "I couldn't find any fathers of bart based on the available information."
@@ -1,6 +1,6 @@
-from logic_lm_implementation import LOGIC_LM, Var, SymbolicReasoner
+from logic_lm_implementation import LOGIC_LM, KnowledgeBase, Var, SymbolicReasoner
 
-family_kb = {
+family_kb = KnowledgeBase({
     ('parent', 'homer', 'bart'): True,
     ('parent', 'homer', 'lisa'): True,
     ('parent', 'homer', 'maggie'): True,
@@ -26,7 +26,7 @@ family_kb = {
     ('female', 'jackie'): True,
     ('female', 'patty'): True,
     ('female', 'selma'): True,
-}
+})
 
 def find_all_father(X, Y):
     results = []
@@ -191,8 +191,7 @@ questions = [
 print("Testing LOGIC-LM with the Simpsons family knowledge base:")
 print("-" * 70)
 
-for question in questions:
+for question, answer in zip(questions, logic_lm.answer_questions(questions)):
     print(f"Question: {question}")
-    answer = logic_lm.answer_question(question)
     print(f"Answer: {answer}")
     print("-" * 70)
\ No newline at end of file
@@ -0,0 +1,45 @@
+import re
+
+import pytest
+
+from logic_lm_implementation import ProblemFormulator, name_groups
+
+CASES = [
+    (r"(\w+) and \1", ["bob and bob", "bob and ann"]),
+    (r"(?P<who>\w+) is (?P=who)", ["al is al", "al is bo"]),
+    (r"(a)?(?(1)b|c)d", ["abd", "cd", "ad"]),
+    (r"(?P<x>a)?(?(x)b|c)", ["ab", "c"]),
+    (r"[(]+(\w)[\]\\1]\1", ["((a]a", "(a\\a"]),
+    (r"[]()](x)\1", ["]xx", "(xx"]),
+    (r"(a)(b)(c)(d)(e)(f)(g)(h)(i)(j)(k)\11", ["abcdefghijkk"]),
+    (r"(a)\101", ["aA"]),
+]
+
+@pytest.mark.parametrize("pattern, inputs", CASES)
+def test_combined_pattern_matches_like_the_template(pattern, inputs):
+    first, _ = name_groups(r"(q)(?P<who>r)", "t0_")
+    second, aliases = name_groups(pattern, "t1_")
+    combined = re.compile(f"(?P<t0>{first})|(?P<t1>{second})")
+    plain = re.compile(pattern)
+    for text in inputs:
+        expected, actual = plain.match(text), combined.match(text)
+        assert (expected is None) == (actual is None)
+        if expected:
+            assert [actual.group(f"t1_{index}") for index in range(1, plain.groups + 1)] == list(expected.groups())
+            assert aliases == plain.groupindex
+
+@pytest.mark.parametrize("pattern", [r"(a)\2", r"(?P<x>a)(?P<x>b)", r"(?P=y)(?P<y>a)", r"(?(2)a|b)(c)"])
+def test_invalid_group_references_are_rejected(pattern):
+    with pytest.raises(ValueError):
+        name_groups(pattern, "t0_")
+
+def test_templates_can_use_backreferences_and_named_groups():
+    formulator = ProblemFormulator()
+    formulator.templates.append({
+        "pattern": r"Is (?P<twin>\w+) the twin of (\w+) and \2\?",
+        "predicate": "twin",
+        "args": [lambda m: m.group("twin"), lambda m: m.group(2)]
+    })
+    assert formulator.formulate("Is bob the twin of al and al?")["args"] == ["bob", "al"]
+    assert formulator.formulate("Is bob the twin of al and ed?")["predicate"] is None
+    assert formulator.formulate("Who is the father of bart?")["args"][1] == "bart"
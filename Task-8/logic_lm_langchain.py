@@ -1,125 +1,623 @@
+import heapq
+import importlib
+import importlib.util
+import io
+import logging
+import math
+import mmap
+import multiprocessing
 import re
-from typing import Dict, Any
+import struct
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import chain, count, islice
+from typing import Dict, Any, Iterable, Iterator, List
 import os
+import sys
 import json
 
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain.schema import Document
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_community.llms import OpenAI
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
-from langchain.memory import ConversationBufferMemory
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+from kb_snapshot import MappedStrings, SymbolTable, lexicographic_order, open_snapshot, save_snapshot, section_end, write_section
+
+SCIPY_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ("numpy", "scipy"))
 
 os.environ["OPENAI_API_KEY"] = "x"
 
+BACKENDS = {
+    "numpy": "numpy",
+    "scipy_sparse": "scipy.sparse",
+    "faiss": "langchain_community.vectorstores:FAISS",
+    "openai_embeddings": "langchain_community.embeddings:OpenAIEmbeddings",
+    "document": "langchain.schema:Document",
+    "text_splitter": "langchain.text_splitter:CharacterTextSplitter",
+    "openai": "langchain_community.llms:OpenAI",
+    "retrieval_qa": "langchain.chains:RetrievalQA",
+    "prompt_template": "langchain.prompts:PromptTemplate",
+    "conversation_memory": "langchain.memory:ConversationBufferMemory",
+}
+LAZY_NAMES = {
+    "FAISS": "faiss",
+    "OpenAIEmbeddings": "openai_embeddings",
+    "Document": "document",
+    "CharacterTextSplitter": "text_splitter",
+    "OpenAI": "openai",
+    "RetrievalQA": "retrieval_qa",
+    "PromptTemplate": "prompt_template",
+    "ConversationBufferMemory": "conversation_memory",
+}
+loaded_backends = {}
+
+def register_backend(name, target):
+    BACKENDS[name] = target
+    loaded_backends.pop(name, None)
+
+def backend(name):
+    loaded = loaded_backends.get(name)
+    if loaded is None:
+        if name not in BACKENDS:
+            raise KeyError(f"No backend registered as '{name}'")
+        target = BACKENDS[name]
+        if callable(target):
+            loaded = target()
+        else:
+            module_name, _, attribute = target.partition(":")
+            loaded = importlib.import_module(module_name)
+            if attribute:
+                loaded = getattr(loaded, attribute)
+        loaded_backends[name] = loaded
+    return loaded
+
+def __getattr__(name):
+    if name in LAZY_NAMES:
+        return backend(LAZY_NAMES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class LazyBackend:
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attribute):
+        return getattr(backend(self.name), attribute)
+
+np = LazyBackend("numpy")
+sparse = LazyBackend("scipy_sparse")
+
+class FactColumns:
+    def __init__(self, arity):
+        self.columns = [array('i') for _ in range(arity)]
+        self.size = 0
+        self.sorted_rows = None
+        self.buckets = None
+        self.distinct = None
+        self.mapped = False
+
+    def thaw(self):
+        columns = []
+        for column in self.columns:
+            columns.append(array('i'))
+            columns[-1].frombytes(column.cast('B'))
+        self.columns = columns
+        self.mapped = False
+
+    def append(self, ids):
+        if self.mapped:
+            self.thaw()
+        for column, value in zip(self.columns, ids):
+            column.append(value)
+        if self.buckets is not None:
+            for buckets, value in zip(self.buckets, ids):
+                bucket = buckets.get(value)
+                if bucket is None:
+                    bucket = buckets[value] = array('i')
+                bucket.append(self.size)
+        self.size += 1
+        self.sorted_rows = None
+
+    def delete(self, row):
+        if self.mapped:
+            self.thaw()
+        for column in self.columns:
+            del column[row]
+        self.size -= 1
+        self.sorted_rows = None
+        self.buckets = None
+
+    def index(self):
+        if self.sorted_rows is None:
+            self.sorted_rows = [array('i', sorted(range(self.size), key=column.__getitem__)) for column in self.columns]
+        return self.sorted_rows
+
+    def hash_index(self):
+        if self.buckets is None:
+            self.buckets = []
+            for column in self.columns:
+                buckets = {}
+                for row, value in enumerate(column):
+                    bucket = buckets.get(value)
+                    if bucket is None:
+                        bucket = buckets[value] = array('i')
+                    bucket.append(row)
+                self.buckets.append(buckets)
+        return self.buckets
+
+    def distinct_counts(self):
+        if not self.mapped:
+            return [len(buckets) for buckets in self.hash_index()]
+        if self.distinct is None:
+            self.distinct = []
+            for column, rows in zip(self.columns, self.index()):
+                self.distinct.append(sum(1 for previous, row in zip(rows, rows[1:]) if column[previous] != column[row]) + (1 if self.size else 0))
+        return self.distinct
+
+    def rows(self, pattern):
+        bound = [(position, value) for position, value in enumerate(pattern) if value is not None]
+        if not bound:
+            return range(self.size)
+        candidates = None
+        if self.mapped:
+            sorted_rows = self.index()
+            for position, value in bound:
+                rows, key = sorted_rows[position], self.columns[position].__getitem__
+                low = bisect_left(rows, value, key=key)
+                high = bisect_right(rows, value, low, key=key)
+                if candidates is None or high - low < len(candidates):
+                    candidates = rows[low:high]
+        else:
+            buckets = self.hash_index()
+            for position, value in bound:
+                rows = buckets[position].get(value, ())
+                if candidates is None or len(rows) < len(candidates):
+                    candidates = rows
+        if len(bound) == 1:
+            return candidates[:]
+        return [row for row in candidates if all(self.columns[position][row] == value for position, value in bound)]
+
+class FactStore:
+    def __init__(self, facts=()):
+        self.symbols = SymbolTable()
+        self.relations = {}
+        for fact in facts:
+            self.add(fact)
+        for relations in self.relations.values():
+            for relation in relations.values():
+                relation.hash_index()
+
+    def add(self, fact):
+        relations = self.relations.setdefault(fact[0], {})
+        relation = relations.get(len(fact) - 1)
+        if relation is None:
+            relation = relations[len(fact) - 1] = FactColumns(len(fact) - 1)
+        relation.append([self.symbols.intern(value) for value in fact[1:]])
+
+    def locate(self, fact):
+        relation = self.relations.get(fact[0], {}).get(len(fact) - 1)
+        ids = [self.symbols.lookup(value) for value in fact[1:]]
+        if relation is None or None in ids:
+            return relation, None
+        return relation, next(iter(relation.rows(ids)), None)
+
+    def remove(self, fact):
+        relation, row = self.locate(fact)
+        if row is None:
+            return False
+        relation.delete(row)
+        return True
+
+    def __contains__(self, fact):
+        return self.locate(fact)[1] is not None
+
+    def __len__(self):
+        return sum(relation.size for relations in self.relations.values() for relation in relations.values())
+
+    def __iter__(self):
+        for predicate in list(self.relations):
+            for values in self.match(predicate, ()):
+                yield (predicate,) + values
+
+    def match(self, predicate, pattern):
+        symbols = self.symbols.symbols
+        for arity, relation in list(self.relations.get(predicate, {}).items()):
+            ids = []
+            for position in range(arity):
+                value = pattern[position] if position < len(pattern) else None
+                if value is not None:
+                    value = self.symbols.lookup(value)
+                    if value is None:
+                        break
+                ids.append(value)
+            else:
+                columns = relation.columns
+                for row in relation.rows(ids):
+                    yield tuple(symbols[column[row]] for column in columns)
+
+    def save(self, path):
+        relations = [(predicate, relation.size, relation.columns, relation.index(), lexicographic_order(relation.columns, relation.size))
+                     for predicate, relations in self.relations.items() for relation in relations.values()]
+        save_snapshot(path, [self.symbols.symbols[symbol_id] for symbol_id in range(len(self.symbols.symbols))], relations)
+
+    @classmethod
+    def open(cls, path):
+        symbols, relations, mapping = open_snapshot(path)
+        store = cls()
+        store.symbols = symbols
+        for predicate, rows, columns, sorted_rows, _ in relations:
+            relation = store.relations.setdefault(predicate, {})[len(columns)] = FactColumns(len(columns))
+            relation.columns = columns
+            relation.sorted_rows = sorted_rows
+            relation.size = rows
+            relation.mapped = True
+        store.mapping = mapping
+        return store
+
+def is_variable(term):
+    return term[:1].isupper() or term[:1] == "_"
+
 class KnowledgeBase:
-    def __init__(self):
-        self.facts = [
-            ("father", "john", "alice"),
-            ("father", "john", "bob"),
-            ("father", "mike", "john"),
-            ("father", "peter", "lucy"),
-            ("father", "james", "peter"),
-            ("father", "david", "sarah"),
-            ("father", "eric", "tom"),
-            ("father", "tom", "emma"),
-            ("mother", "mary", "alice"),
-            ("mother", "mary", "bob"),
-            ("mother", "sarah", "john"),
-            ("mother", "jennifer", "lucy"),
-            ("mother", "patricia", "peter"),
-            ("mother", "laura", "sarah"),
-            ("mother", "karen", "tom"),
-            ("mother", "lisa", "emma"),
-        ]
+    def __init__(self, snapshot=None):
+        snapshot = snapshot or os.environ.get("KB_SNAPSHOT_PATH")
+        if snapshot and os.path.exists(snapshot):
+            self.facts = FactStore.open(snapshot)
+        else:
+            self.facts = FactStore([
+                ("father", "john", "alice"),
+                ("father", "john", "bob"),
+                ("father", "mike", "john"),
+                ("father", "peter", "lucy"),
+                ("father", "james", "peter"),
+                ("father", "david", "sarah"),
+                ("father", "eric", "tom"),
+                ("father", "tom", "emma"),
+                ("mother", "mary", "alice"),
+                ("mother", "mary", "bob"),
+                ("mother", "sarah", "john"),
+                ("mother", "jennifer", "lucy"),
+                ("mother", "patricia", "peter"),
+                ("mother", "laura", "sarah"),
+                ("mother", "karen", "tom"),
+                ("mother", "lisa", "emma"),
+            ])
+        self.rules = {
+            "is_father": (("X", "Y"), [[("father", "X", "Y")]]),
+            "is_mother": (("X", "Y"), [[("mother", "X", "Y")]]),
+            "is_parent": (("X", "Y"), [[("is_father", "X", "Y")], [("is_mother", "X", "Y")]]),
+            "is_child": (("X", "Y"), [[("is_parent", "Y", "X")]]),
+            "is_grandparent": (("X", "Z"), [[("is_parent", "X", "Y"), ("is_parent", "Y", "Z")]]),
+            "is_sibling": (("X", "Y"), [[("is_parent", "Z", "X"), ("is_parent", "Z", "Y"), ("!=", "X", "Y")]]),
+        }
+        self.plans = {}
+        self.tables = {}
+        self.tabled_rules = {"is_ancestor": self.derive_ancestor}
+        self.matrices = {}
+        self.bulk_rules = {"is_grandparent", "is_sibling", "is_ancestor", "is_descendant"}
+        self.version = 0
         
-    def query(self, predicate, args):
-        results = []
+    def add_fact(self, fact):
+        if fact in self.facts:
+            return False
+        self.facts.add(fact)
+        self.facts_changed()
+        return True
+
+    def remove_fact(self, fact):
+        if not self.facts.remove(fact):
+            return False
+        self.facts_changed()
+        return True
+
+    def facts_changed(self):
+        self.version += 1
+        self.tables.clear()
+        self.matrices.clear()
+        self.plans.clear()
+
+    def iter_query(self, predicate, args):
         var_positions = [i for i, arg in enumerate(args) if isinstance(arg, Var)]
-        for fact in self.facts:
-            if fact[0] == predicate:
-                match = True
-                for i, arg in enumerate(args):
-                    if i + 1 < len(fact) and not isinstance(arg, Var) and arg != fact[i + 1]:
-                        match = False
-                        break
-                if match:
-                    result = {}
-                    for pos in var_positions:
-                        if pos + 1 < len(fact):
-                            var_name = args[pos].name
-                            result[var_name] = fact[pos + 1]
-                    if result or not var_positions:
-                        results.append(result)
-        return results
-    
-    def query_rule(self, rule_name, args):
-        if rule_name == "is_father":
-            return self.query("father", args)
-        elif rule_name == "is_mother":
-            return self.query("mother", args)
-        elif rule_name == "is_parent":
-            father_results = self.query("father", args)
-            mother_results = self.query("mother", args)
-            return father_results + mother_results
-        elif rule_name == "is_child":
+        pattern = [None if isinstance(arg, Var) else arg for arg in args]
+        for values in self.facts.match(predicate, pattern):
+            result = {}
+            for pos in var_positions:
+                if pos < len(values):
+                    result[args[pos].name] = values[pos]
+            if result or not var_positions:
+                yield result
+
+    def query(self, predicate, args):
+        return list(self.iter_query(predicate, args))
+
+    def iter_rule(self, rule_name, args):
+        if SCIPY_AVAILABLE and rule_name in self.bulk_rules and len(args) == 2 and all(isinstance(arg, Var) for arg in args) and args[0].name != args[1].name:
+            yield from self.iter_bulk(rule_name, args)
+        elif rule_name in self.rules:
+            yield from self.iter_planned(rule_name, args)
+        elif rule_name == "is_ancestor":
+            yield from self.query_tabled("is_ancestor", args)
+        elif rule_name == "is_descendant":
             swapped_args = [args[1], args[0]] if len(args) >= 2 else args
-            return self.query_rule("is_parent", swapped_args)
+            yield from self.query_tabled("is_ancestor", swapped_args)
+
+    def query_rule(self, rule_name, args, limit=None):
+        return list(islice(self.iter_rule(rule_name, args), limit))
+
+    def exists(self, rule_name, args):
+        return next(self.iter_rule(rule_name, args), None) is not None
+
+    def unfold(self, literal, fresh):
+        if literal[0] not in self.rules:
+            return [[literal]]
+        head, bodies = self.rules[literal[0]]
+        conjunctions = []
+        for body in bodies:
+            renamed = dict(zip(head, literal[1:]))
+            for sub_literal in body:
+                for term in sub_literal[1:]:
+                    if is_variable(term) and term not in renamed:
+                        renamed[term] = f"{term}_{next(fresh)}"
+            partials = [[]]
+            for sub_literal in body:
+                options = self.unfold((sub_literal[0],) + tuple(renamed.get(term, term) for term in sub_literal[1:]), fresh)
+                partials = [partial + option for partial in partials for option in options]
+            conjunctions.extend(partials)
+        return conjunctions
+
+    def compile_rule(self, rule_name):
+        head, bodies = self.rules[rule_name]
+        fresh = count()
+        compiled = []
+        for body in bodies:
+            partials = [[]]
+            for literal in body:
+                options = self.unfold(literal, fresh)
+                if all(len(option) == 1 for option in options) and len({frozenset(filter(is_variable, option[0][1:])) for option in options}) == 1:
+                    partials = [partial + [[option[0] for option in options]] for partial in partials]
+                else:
+                    partials = [partial + [[atom] for atom in option] for partial in partials for option in options]
+            compiled.extend(partials)
+        return head, compiled
+
+    def estimate(self, step, bound):
+        rows = 0.0
+        for atom in step:
+            relation = self.facts.relations.get(atom[0], {}).get(len(atom) - 1)
+            if relation is None:
+                continue
+            estimate = float(relation.size)
+            for term, distinct in zip(atom[1:], relation.distinct_counts()):
+                if term in bound or not is_variable(term):
+                    estimate /= max(distinct, 1)
+            rows += estimate
+        return rows
+
+    def plan_rule(self, rule_name, bound_positions):
+        key = (rule_name, bound_positions)
+        plan = self.plans.get(key)
+        if plan is not None:
+            return plan
+        head, bodies = self.compile_rule(rule_name)
+        slots = {term: slot for slot, term in enumerate(head)}
+        planned = []
+        distinct = False
+        for body in bodies:
+            bound = {head[position] for position in bound_positions}
+            remaining = list(body)
+            steps = []
+            while remaining:
+                ready = [step for step in remaining if step[0][0] == "!=" and all(term in bound for term in step[0][1:] if is_variable(term))]
+                candidates = [step for step in remaining if step[0][0] != "!="]
+                if ready:
+                    step, rows = ready[0], None
+                elif candidates:
+                    step = min(candidates, key=lambda candidate: self.estimate(candidate, bound))
+                    rows = self.estimate(step, bound)
+                else:
+                    step, rows = remaining[0], None
+                remaining.remove(step)
+                for atom in step:
+                    for term in atom[1:]:
+                        if term not in slots:
+                            slots[term] = len(slots)
+                if step[0][0] == "!=":
+                    steps.append(("!=", slots[step[0][1]], slots[step[0][2]], step, rows))
+                else:
+                    alternatives = []
+                    for atom in step:
+                        probe, free, checks, assigned = [], [], [], set()
+                        for position, term in enumerate(atom[1:]):
+                            if term in bound or not is_variable(term):
+                                probe.append(slots[term])
+                            elif term in assigned:
+                                probe.append(None)
+                                checks.append((position, slots[term]))
+                            else:
+                                probe.append(None)
+                                free.append((position, slots[term]))
+                                assigned.add(term)
+                        alternatives.append((atom[0], len(atom) - 1, probe, free, checks))
+                    steps.append(("match", alternatives, None, step, rows))
+                bound.update(term for atom in step for term in atom[1:] if is_variable(term))
+            distinct = distinct or any(is_variable(term) and term not in head for step in body for atom in step for term in atom[1:])
+            planned.append(steps)
+        constants = [(slot, term) for term, slot in slots.items() if not is_variable(term)]
+        plan = self.plans[key] = (head, len(slots), constants, planned, distinct)
+        return plan
+
+    def run_steps(self, steps, index, slots):
+        if index == len(steps):
+            yield
+            return
+        kind, alternatives, other, _, _ = steps[index]
+        if kind == "!=":
+            if slots[alternatives] != slots[other]:
+                yield from self.run_steps(steps, index + 1, slots)
+            return
+        for predicate, arity, probe, free, checks in alternatives:
+            relation = self.facts.relations.get(predicate, {}).get(arity)
+            if relation is None:
+                continue
+            columns = relation.columns
+            for row in relation.rows([None if slot is None else slots[slot] for slot in probe]):
+                for position, slot in free:
+                    slots[slot] = columns[position][row]
+                if all(columns[position][row] == slots[slot] for position, slot in checks):
+                    yield from self.run_steps(steps, index + 1, slots)
+
+    def iter_planned(self, rule_name, args):
+        head = self.rules[rule_name][0]
+        if len(args) != len(head):
+            return
+        bound_positions = tuple(position for position, arg in enumerate(args) if not isinstance(arg, Var))
+        head, slot_count, constants, bodies, distinct = self.plan_rule(rule_name, bound_positions)
+        lookup = self.facts.symbols.lookup
+        initial = [None] * slot_count
+        for slot, value in chain(((position, args[position]) for position in bound_positions), constants):
+            initial[slot] = lookup(value)
+            if initial[slot] is None:
+                return
+        outputs = [(arg.name, position) for position, arg in enumerate(args) if isinstance(arg, Var)]
+        symbols = self.facts.symbols.symbols
+        seen = set() if distinct else None
+        for steps in bodies:
+            slots = list(initial)
+            for _ in self.run_steps(steps, 0, slots):
+                if seen is not None:
+                    key = tuple(slots[position] for _, position in outputs)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                yield {name: symbols[slots[position]] for name, position in outputs}
+
+    def explain(self, rule_name, args):
+        bound_positions = tuple(position for position, arg in enumerate(args) if not isinstance(arg, Var))
+        lines = []
+        for number, steps in enumerate(self.plan_rule(rule_name, bound_positions)[3]):
+            for kind, alternatives, _, step, rows in steps:
+                atoms = " | ".join(f"{atom[0]}({', '.join(atom[1:])})" for atom in step)
+                if kind == "!=":
+                    lines.append(f"body {number}: filter {atoms}")
+                else:
+                    access = "index" if any(slot is not None for alternative in alternatives for slot in alternative[2]) else "scan"
+                    lines.append(f"body {number}: {access} {atoms} ~{rows:.1f} rows")
+        return lines
+
+    def relation_matrix(self, rule_name):
+        matrix = self.matrices.get(rule_name)
+        if matrix is not None:
+            return matrix
+        size = len(self.facts.symbols.symbols)
+        if rule_name == "is_parent":
+            rows, cols = [], []
+            for predicate in ("father", "mother"):
+                relation = self.facts.relations.get(predicate, {}).get(2)
+                if relation is not None:
+                    rows.append(np.frombuffer(relation.columns[0], dtype=np.intc))
+                    cols.append(np.frombuffer(relation.columns[1], dtype=np.intc))
+            rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.intc)
+            cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.intc)
+            matrix = sparse.csr_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(size, size))
         elif rule_name == "is_grandparent":
-            results = []
-            child_arg = args[1] if len(args) >= 2 else None
-            if not isinstance(args[0], Var):
-                potential_parent = Var("Y")
-                parent_results = self.query_rule("is_child", [potential_parent, args[0]])
-                for parent_result in parent_results:
-                    parent_name = parent_result.get("Y")
-                    if parent_name:
-                        if self.query_rule("is_parent", [parent_name, child_arg]):
-                            results.append({})
-                return results
-            parent_var = Var("Y")
-            parent_results = self.query_rule("is_parent", [parent_var, child_arg])
-            for parent_result in parent_results:
-                parent_name = parent_result.get("Y")
-                if parent_name:
-                    grandparent_results = self.query_rule("is_parent", [Var("X"), parent_name])
-                    results.extend(grandparent_results)
-            return results
+            parent = self.relation_matrix("is_parent")
+            matrix = (parent @ parent).tocsr()
         elif rule_name == "is_sibling":
-            results = []
-            if len(args) >= 2 and not isinstance(args[0], Var) and not isinstance(args[1], Var):
-                person1, person2 = args[0], args[1]
-                parent_var = Var("Z")
-                parents1 = self.query_rule("is_parent", [parent_var, person1])
-                for parent_result in parents1:
-                    parent_name = parent_result.get("Z")
-                    if parent_name:
-                        if self.query_rule("is_parent", [parent_name, person2]):
-                            if person1 != person2:
-                                return [{}]
-                return []
-            if len(args) >= 2 and isinstance(args[0], Var):
-                person = args[1]
-                parent_var = Var("Z")
-                parents = self.query_rule("is_parent", [parent_var, person])
-                for parent_result in parents:
-                    parent_name = parent_result.get("Z")
-                    if parent_name:
-                        potential_siblings = self.query_rule("is_child", [Var("X"), parent_name])
-                        for sibling_result in potential_siblings:
-                            sibling_name = sibling_result.get("X")
-                            if sibling_name and sibling_name != person:
-                                results.append({"X": sibling_name})
-            unique_results = []
-            seen = set()
-            for result in results:
-                if "X" in result and result["X"] not in seen:
-                    seen.add(result["X"])
-                    unique_results.append(result)
-            return unique_results
-        return []
+            parent = self.relation_matrix("is_parent")
+            shared = (parent.T @ parent).tocoo()
+            keep = shared.row != shared.col
+            matrix = sparse.csr_matrix((shared.data[keep], (shared.row[keep], shared.col[keep])), shape=(size, size))
+        elif rule_name == "is_ancestor":
+            parent = self.relation_matrix("is_parent")
+            matrix = parent
+            while True:
+                updated = (parent + parent @ matrix).tocsr()
+                if updated.nnz == matrix.nnz:
+                    break
+                matrix = updated
+        elif rule_name == "is_descendant":
+            matrix = self.relation_matrix("is_ancestor").T.tocsr()
+        matrix.eliminate_zeros()
+        matrix.sort_indices()
+        self.matrices[rule_name] = matrix
+        return matrix
+
+    def iter_bulk(self, rule_name, args):
+        pairs = self.relation_matrix(rule_name).tocoo()
+        symbols = self.facts.symbols.symbols
+        for row, col in zip(pairs.row.tolist(), pairs.col.tolist()):
+            yield {args[0].name: symbols[row], args[1].name: symbols[col]}
+
+    def query_tabled(self, rule_name, args):
+        pattern = tuple(None if isinstance(arg, Var) else arg for arg in args)
+        results = []
+        for answer in self.tabled_answers((rule_name, pattern)):
+            result = {}
+            for arg, value in zip(args, answer):
+                if isinstance(arg, Var):
+                    result[arg.name] = value
+            results.append(result)
+        return results
+
+    def tabled_answers(self, key, evaluation=None):
+        table = self.tables.get(key)
+        if table is not None:
+            return list(table["answers"])
+        if evaluation is None:
+            return list(self.complete_table(key)["answers"])
+        table = evaluation["tables"].get(key)
+        if table is None:
+            table = evaluation["tables"][key] = {"answers": {}, "consumers": set(), "complete": False}
+            self.schedule(evaluation, key)
+        table["consumers"].add(evaluation["current"])
+        return list(table["answers"])
+
+    def schedule(self, evaluation, key):
+        order = evaluation["order"]
+        if key not in order:
+            order[key] = len(order)
+        if key not in evaluation["scheduled"]:
+            evaluation["scheduled"].add(key)
+            heapq.heappush(evaluation["worklist"], (-order[key], key))
+
+    def complete_table(self, key):
+        version = self.version
+        evaluation = {"tables": {}, "worklist": [], "scheduled": set(), "order": {}, "current": None}
+        tables = evaluation["tables"]
+        table = tables[key] = {"answers": {}, "consumers": set(), "complete": False}
+        self.schedule(evaluation, key)
+        while evaluation["worklist"]:
+            _, current = heapq.heappop(evaluation["worklist"])
+            evaluation["scheduled"].discard(current)
+            current_table = tables[current]
+            evaluation["current"] = current
+            grew = False
+            for answer in self.tabled_rules[current[0]](current[1], evaluation):
+                if answer not in current_table["answers"]:
+                    current_table["answers"][answer] = True
+                    grew = True
+            if grew:
+                for consumer in current_table["consumers"]:
+                    self.schedule(evaluation, consumer)
+        for member in tables.values():
+            member["complete"] = True
+            member["consumers"].clear()
+        if self.version == version:
+            self.tables.update(tables)
+        return table
+
+    def derive_ancestor(self, pattern, evaluation):
+        ancestor, descendant = pattern
+        answers = []
+        parent_args = [Var("X") if ancestor is None else ancestor, Var("Y") if descendant is None else descendant]
+        for result in self.query_rule("is_parent", parent_args):
+            answers.append((result.get("X", ancestor), result.get("Y", descendant)))
+        if ancestor is not None:
+            for child_result in self.query_rule("is_parent", [ancestor, Var("Z")]):
+                for _, found in self.tabled_answers(("is_ancestor", (child_result["Z"], descendant)), evaluation):
+                    answers.append((ancestor, found))
+        else:
+            for middle, found in self.tabled_answers(("is_ancestor", (None, descendant)), evaluation):
+                for parent_result in self.query_rule("is_parent", [Var("X"), middle]):
+                    answers.append((parent_result["X"], found))
+        return answers
 
 class Var:
     def __init__(self, name):
@@ -128,6 +626,60 @@ class Var:
     def __repr__(self):
         return f"_{self.name}"
 
+GROUP_SYNTAX = re.compile(r"\\(?![0-7]{3})([1-9][0-9]?)|\(\?P<([^>]*)>|\(\?P=([^)]*)\)|\(\?\(([^)]*)\)|\((?!\?)")
+CLASS_START = re.compile(r"\[\^?\]?")
+
+def name_groups(pattern, prefix):
+    parts = []
+    aliases = {}
+    groups = 0
+    position = 0
+    def reference(name):
+        index = int(name) if name.isdigit() else aliases.get(name)
+        if index is None or not 1 <= index <= groups:
+            raise ValueError(f"Template pattern {pattern!r} refers to undefined group {name!r}")
+        return f"{prefix}{index}"
+    while position < len(pattern):
+        char = pattern[position]
+        if char == "[":
+            end = CLASS_START.match(pattern, position).end()
+            while end < len(pattern) and pattern[end] != "]":
+                end += 2 if pattern[end] == "\\" else 1
+            parts.append(pattern[position:end + 1])
+            position = end + 1
+            continue
+        match = GROUP_SYNTAX.match(pattern, position)
+        if match is None:
+            step = 2 if char == "\\" else 1
+            parts.append(pattern[position:position + step])
+            position += step
+            continue
+        number, name, named_reference, condition = match.groups()
+        if number is not None:
+            parts.append(f"(?P={reference(number)})")
+        elif named_reference is not None:
+            parts.append(f"(?P={reference(named_reference)})")
+        elif condition is not None:
+            parts.append(f"(?({reference(condition)})")
+        else:
+            if name is not None:
+                if not name.isidentifier() or name in aliases:
+                    raise ValueError(f"Template pattern {pattern!r} has an invalid or repeated group name {name!r}")
+                aliases[name] = groups + 1
+            groups += 1
+            parts.append(f"(?P<{prefix}{groups}>")
+        position = match.end()
+    return "".join(parts), aliases
+
+class TemplateMatch:
+    def __init__(self, match, template_index, aliases):
+        self.match = match
+        self.name = f"t{template_index}"
+        self.aliases = aliases
+
+    def group(self, index=0):
+        return self.match.group(self.name if index == 0 else f"{self.name}_{self.aliases.get(index, index)}")
+
 class ProblemFormulator:
     def __init__(self):
         self.templates = [
@@ -180,21 +732,54 @@ class ProblemFormulator:
                 "pattern": r"Are (\w+) and (\w+) siblings\?",
                 "predicate": "is_sibling",
                 "args": [lambda m: m.group(1).lower(), lambda m: m.group(2).lower()]
+            },
+            {
+                "pattern": r"Who (are|is) the ancestor(s)? of (\w+)\?",
+                "predicate": "is_ancestor",
+                "args": [lambda m: Var("X"), lambda m: m.group(3).lower()]
+            },
+            {
+                "pattern": r"Is (\w+) an ancestor of (\w+)\?",
+                "predicate": "is_ancestor",
+                "args": [lambda m: m.group(1).lower(), lambda m: m.group(2).lower()]
+            },
+            {
+                "pattern": r"Who (are|is) the descendant(s)? of (\w+)\?",
+                "predicate": "is_descendant",
+                "args": [lambda m: Var("X"), lambda m: m.group(3).lower()]
+            },
+            {
+                "pattern": r"Is (\w+) a descendant of (\w+)\?",
+                "predicate": "is_descendant",
+                "args": [lambda m: m.group(1).lower(), lambda m: m.group(2).lower()]
             }
         ]
+        self.compiled = None
+        self.aliases = []
+        self.compiled_count = 0
     
+    def dispatcher(self):
+        if self.compiled is None or self.compiled_count != len(self.templates):
+            named = [name_groups(template['pattern'], f't{i}_') for i, template in enumerate(self.templates)]
+            self.compiled = re.compile("|".join(f"(?P<t{i}>{pattern})" for i, (pattern, _) in enumerate(named)), re.IGNORECASE)
+            self.aliases = [aliases for _, aliases in named]
+            self.compiled_count = len(self.templates)
+        return self.compiled
+
     def formulate(self, question: str) -> Dict[str, Any]:
-        for template in self.templates:
-            match = re.match(template["pattern"], question, re.IGNORECASE)
-            if match:
-                args = [arg_extractor(match) for arg_extractor in template["args"]]
-                formulation = {
-                    "predicate": template["predicate"],
-                    "args": args,
-                    "query_type": "boolean" if all(not isinstance(arg, Var) for arg in args) else "wh-question",
-                    "original_question": question
-                }
-                return formulation
+        match = self.dispatcher().match(question)
+        if match:
+            template_index = int(match.lastgroup[1:])
+            template = self.templates[template_index]
+            match = TemplateMatch(match, template_index, self.aliases[template_index])
+            args = [arg_extractor(match) for arg_extractor in template["args"]]
+            formulation = {
+                "predicate": template["predicate"],
+                "args": args,
+                "query_type": "boolean" if all(not isinstance(arg, Var) for arg in args) else "wh-question",
+                "original_question": question
+            }
+            return formulation
         return {
             "predicate": None,
             "args": [],
@@ -202,62 +787,273 @@ class ProblemFormulator:
             "original_question": question
         }
 
+    def formulate_many(self, questions: Iterable[str]) -> List[Dict[str, Any]]:
+        return [self.formulate(question) for question in questions]
+
 class SymbolicReasoner:
     def __init__(self, knowledge_base):
         self.kb = knowledge_base
-    def reason(self, formulation: Dict[str, Any]) -> List[Dict[str, str]]:
+    def reason(self, formulation: Dict[str, Any]) -> Iterator[Dict[str, str]]:
         predicate = formulation.get("predicate")
         args = formulation.get("args", [])
         if not predicate or not args:
-            return []
-        return self.kb.query_rule(predicate, args)
+            return iter(())
+        if formulation.get("query_type") == "boolean":
+            return iter([{}] if self.kb.exists(predicate, args) else ())
+        return self.kb.iter_rule(predicate, args)
+
+def write_lines(lines: Iterable[str], out, buffer_size: int = 65536) -> int:
+    if hasattr(out, "sendall"):
+        send = lambda chunk: out.sendall(chunk.encode('utf-8'))
+    elif isinstance(out, io.TextIOBase):
+        send = out.write
+    else:
+        send = lambda chunk: out.write(chunk.encode('utf-8'))
+    buffered, size, written = [], 0, 0
+    for line in lines:
+        buffered.append(line)
+        buffered.append("\n")
+        size += len(line) + 1
+        written += 1
+        if size >= buffer_size:
+            send("".join(buffered))
+            buffered, size = [], 0
+    if buffered:
+        send("".join(buffered))
+    return written
 
 class ResultInterpreter:
-    def interpret(self, reasoning_results: List[Dict[str, str]], formulation: Dict[str, Any]) -> str:
-        if not reasoning_results:
+    def __init__(self):
+        self.phrases = {
+            "father": "is the father of",
+            "mother": "is the mother of",
+            "child": "is a child of",
+            "grandparent": "is a grandparent of",
+            "sibling": "is a sibling of",
+            "ancestor": "is an ancestor of",
+            "descendant": "is a descendant of"
+        }
+        self.renderers = {}
+
+    def interpret(self, reasoning_results: Iterable[Dict[str, str]], formulation: Dict[str, Any]) -> str:
+        return "\n".join(self.iter_interpret(reasoning_results, formulation))
+
+    def iter_interpret(self, reasoning_results: Iterable[Dict[str, str]], formulation: Dict[str, Any]) -> Iterator[str]:
+        reasoning_results = iter(reasoning_results)
+        first = next(reasoning_results, None)
+        if first is None:
             predicate = formulation.get("predicate", "")
             args = formulation.get("args", [])
             query_type = formulation.get("query_type", "")
             if query_type == "boolean":
                 rel_type = predicate.replace("is_", "")
-                return f"No, {args[0]} is not the {rel_type} of {args[1]} based on the available information."
+                yield f"No, {args[0]} is not the {rel_type} of {args[1]} based on the available information."
             else:
                 rel_type = predicate.replace("is_", "")
-                return f"I couldn't find any {rel_type}s of {args[1]} based on the available information."
+                yield f"I couldn't find any {rel_type}s of {args[1]} based on the available information."
+            return
         predicate = formulation.get("predicate", "").replace("is_", "")
         args = formulation.get("args", [])
         query_type = formulation.get("query_type", "")
         if query_type == "boolean":
-            return f"Yes, {args[0]} is the {predicate} of {args[1]}."
-        responses = []
-        for result in reasoning_results:
-            var_arg_index = None
-            for i, arg in enumerate(args):
-                if isinstance(arg, Var):
-                    var_arg_index = i
-                    break
-            if var_arg_index is not None and result:
-                var_name = args[var_arg_index].name
-                if var_name in result:
-                    value = result[var_name]
-                    if predicate == "father":
-                        responses.append(f"{value} is the father of {args[1]}.")
-                    elif predicate == "mother":
-                        responses.append(f"{value} is the mother of {args[1]}.")
-                    elif predicate == "child":
-                        responses.append(f"{value} is a child of {args[1]}.")
-                    elif predicate == "grandparent":
-                        responses.append(f"{value} is a grandparent of {args[1]}.")
-                    elif predicate == "sibling":
-                        responses.append(f"{value} is a sibling of {args[1]}.")
-        if responses:
-            return "\n".join(responses)
+            yield f"Yes, {args[0]} is the {predicate} of {args[1]}."
+            return
+        responded = False
+        render = self.renderer(predicate, args)
+        for result in chain([first], reasoning_results):
+            response = render(result)
+            if response:
+                responded = True
+                yield response
+        if not responded:
+            yield "No specific results found based on the available information."
+
+    def renderer(self, predicate, args):
+        var_index = next((i for i, arg in enumerate(args) if isinstance(arg, Var)), None)
+        key = (predicate, var_index)
+        compiled = self.renderers.get(key)
+        if compiled is None:
+            compiled = self.renderers[key] = self.compile_renderer(predicate, var_index)
+        return compiled(args)
+
+    def compile_renderer(self, predicate, var_index):
+        phrase = self.phrases.get(predicate)
+        if phrase is None or var_index is None:
+            return lambda args: lambda result: None
+        if var_index == 0:
+            def bind(args):
+                name, suffix = args[0].name, f" {phrase} {args[1]}."
+                return lambda result: f"{result[name]}{suffix}" if name in result else None
+        else:
+            def bind(args):
+                name, prefix = args[var_index].name, f"{args[0]} {phrase} "
+                return lambda result: f"{prefix}{result[name]}." if name in result else None
+        return bind
+
+    def write(self, reasoning_results: Iterable[Dict[str, str]], formulation: Dict[str, Any], out, buffer_size: int = 65536) -> int:
+        return write_lines(self.iter_interpret(reasoning_results, formulation), out, buffer_size)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+EMBEDDING_STOPWORDS = {"the", "and", "are", "was", "were", "for", "with", "this", "that", "from", "who", "what", "how", "why", "when", "where", "which", "about", "tell", "does", "did", "has", "have", "his", "her", "him", "she", "they", "their", "them", "its", "our", "your", "you", "not", "any", "all", "can", "will", "would", "should", "could", "into", "than", "then", "there", "these", "those", "also", "making", "because"}
+
+class HashingEmbedder:
+    def __init__(self, dimensions=None):
+        self.dimensions = dimensions or int(os.getenv("RAG_EMBEDDING_DIM", "256"))
+        self.features = {}
+
+    def token_features(self, token):
+        features = self.features.get(token)
+        if features is None:
+            padded = f"#{token}#"
+            grams = [token] + [padded[i:i + 3] for i in range(len(padded) - 2)]
+            columns, weights = [], []
+            for position, gram in enumerate(grams):
+                digest = zlib.crc32(gram.encode('utf-8'))
+                columns.append(digest % self.dimensions)
+                weights.append((1.0 if position == 0 else 0.5) * (1.0 if digest & 0x80000000 else -1.0))
+            features = self.features[token] = (columns, weights)
+        return features
+
+    def embed(self, texts: List[str], batch_size: int = 4096):
+        output = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            cells, weights = [], []
+            for row, text in enumerate(batch):
+                offset = row * self.dimensions
+                for token in TOKEN_PATTERN.findall(text.lower()):
+                    if len(token) > 2 and token not in EMBEDDING_STOPWORDS:
+                        token_columns, token_weights = self.token_features(token)
+                        cells.extend(offset + column for column in token_columns)
+                        weights.extend(token_weights)
+            output[start:start + len(batch)] = np.bincount(cells, weights, minlength=len(batch) * self.dimensions).reshape(len(batch), self.dimensions)
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        output /= np.where(norms == 0, 1, norms)
+        return output
+
+class VectorIndex:
+    def __init__(self, embedder=None, lists=None, probes=None):
+        self.embedder = embedder or HashingEmbedder()
+        self.lists = lists
+        self.probes = probes or int(os.getenv("RAG_IVF_PROBES", "16"))
+        self.centroids = None
+        self.offsets = None
+        self.ids = None
+        self.vectors = None
+        self.passages = []
+        self.fingerprint = 0
+
+    @staticmethod
+    def fingerprint_of(passages):
+        digest = 0
+        for passage in passages:
+            digest = zlib.crc32(passage.encode('utf-8') + b'\0', digest)
+        return digest
+
+    @staticmethod
+    def assign(vectors, centroids, batch_size=65536):
+        assignment = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch_size):
+            assignment[start:start + batch_size] = np.argmax(vectors[start:start + batch_size] @ centroids.T, axis=1)
+        return assignment
+
+    def train(self, vectors, lists, iterations=10):
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(vectors), min(len(vectors), 64 * lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = self.assign(sample, centroids)
+            members = sparse.csr_matrix((np.ones(len(sample), dtype=np.float32), (assignment, np.arange(len(sample)))), shape=(lists, len(sample)))
+            sums = np.asarray(members @ sample)
+            filled = np.bincount(assignment, minlength=lists) > 0
+            centroids[filled] = sums[filled]
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.where(norms == 0, 1, norms)
+        return centroids
+
+    def build(self, passages: Iterable[str], batch_size: int = 4096):
+        self.passages = list(passages)
+        self.fingerprint = self.fingerprint_of(self.passages)
+        vectors = self.embedder.embed(self.passages, batch_size)
+        lists = max(1, min(self.lists or int(math.sqrt(len(vectors))), len(vectors)))
+        if len(vectors):
+            self.centroids = self.train(vectors, lists)
+            assignment = self.assign(vectors, self.centroids)
         else:
-            return "No specific results found based on the available information."
+            self.centroids = np.zeros((lists, self.embedder.dimensions), dtype=np.float32)
+            assignment = np.zeros(0, dtype=np.int32)
+        order = np.argsort(assignment, kind="stable")
+        self.offsets = np.searchsorted(assignment[order], np.arange(lists + 1)).astype(np.int64)
+        self.ids = order.astype(np.int32)
+        self.vectors = vectors[order]
+        return self
+
+    def search(self, text: str, top_k: int = 5):
+        if self.vectors is None or not len(self.ids):
+            return []
+        query = self.embedder.embed([text])[0]
+        probes = min(self.probes, len(self.centroids))
+        nearest = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+        candidates = []
+        for cell in nearest:
+            start, end = int(self.offsets[cell]), int(self.offsets[cell + 1])
+            if end > start:
+                scores = self.vectors[start:end] @ query
+                keep = np.argpartition(-scores, min(top_k, end - start) - 1)[:top_k]
+                candidates.extend(zip(scores[keep].tolist(), (start + keep).tolist()))
+        best = heapq.nsmallest(top_k, candidates, key=lambda candidate: (-candidate[0], candidate[1]))
+        return [(score, self.passages[int(self.ids[row])]) for score, row in best]
+
+    def save(self, path):
+        passages = [passage.encode('utf-8') for passage in self.passages]
+        offsets = array('q', [0])
+        for passage in passages:
+            offsets.append(offsets[-1] + len(passage))
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            write_section(f, VECTOR_HEADER.pack(VECTOR_MAGIC, VECTOR_VERSION, self.embedder.dimensions, len(self.centroids), len(self.ids), self.fingerprint))
+            write_section(f, np.ascontiguousarray(self.centroids, dtype=np.float32).tobytes())
+            write_section(f, np.ascontiguousarray(self.offsets, dtype=np.int64).tobytes())
+            write_section(f, np.ascontiguousarray(self.ids, dtype=np.int32).tobytes())
+            write_section(f, np.ascontiguousarray(self.vectors, dtype=np.float32).tobytes())
+            write_section(f, offsets)
+            write_section(f, b''.join(passages))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def open(cls, path, probes=None):
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapping)
+        magic, version, dimensions, lists, size, fingerprint = VECTOR_HEADER.unpack_from(view, 0)
+        if magic != VECTOR_MAGIC:
+            raise ValueError(f"{path} is not a vector index")
+        if version != VECTOR_VERSION:
+            raise ValueError(f"{path} has vector index version {version}, expected {VECTOR_VERSION}")
+        position = section_end(VECTOR_HEADER.size)
+        def take(length, dtype, shape=None):
+            nonlocal position
+            section = np.frombuffer(view, dtype=dtype, count=length, offset=position)
+            position = section_end(position + section.nbytes)
+            return section if shape is None else section.reshape(shape)
+        index = cls(HashingEmbedder(dimensions), lists, probes)
+        index.centroids = take(lists * dimensions, np.float32, (lists, dimensions))
+        index.offsets = take(lists + 1, np.int64)
+        index.ids = take(size, np.int32)
+        index.vectors = take(size * dimensions, np.float32, (size, dimensions))
+        passage_offsets = take(size + 1, np.int64)
+        index.passages = MappedStrings(memoryview(passage_offsets).cast('B').cast('q'), view[position:position + int(passage_offsets[-1])])
+        index.fingerprint = fingerprint
+        index.mapping = mapping
+        return index
+
+VECTOR_MAGIC = b'LMVI'
+VECTOR_VERSION = 1
+VECTOR_HEADER = struct.Struct('<4sIIIQI')
 
 class SimpleRAG:
-    def __init__(self):
-        self.knowledge = [
+    def __init__(self, knowledge=None, top_k=None, vector_path=None):
+        self.knowledge = knowledge or [
             "John is the father of Alice and Bob.",
             "Mary is the mother of Alice and Bob.",
             "Mike is John's father, making him Alice and Bob's grandfather.",
@@ -275,21 +1071,177 @@ class SimpleRAG:
             "Tom is Emma's father.",
             "Lisa is Emma's mother."
         ]
-    
+        self.stopwords = {"what", "who", "where", "when", "tell", "about", "family", "relationship"}
+        self.top_k = top_k or int(os.getenv("RAG_TOP_K", "5"))
+        self.k1 = 1.2
+        self.b = 0.75
+        self.postings = {}
+        self.lengths = array('i')
+        self.total_length = 0
+        self.norms = None
+        self.seen = {}
+        self.passages = []
+        self.vector_path = vector_path or os.getenv("RAG_VECTOR_INDEX")
+        self.vector_index = None
+        self.min_similarity = float(os.getenv("RAG_MIN_SIMILARITY", "0.35"))
+        for passage in self.knowledge:
+            self.add_passage(passage)
+
+    @staticmethod
+    def tokenize(text):
+        return TOKEN_PATTERN.findall(text.lower())
+
+    def add_passage(self, passage):
+        normalized = " ".join(passage.lower().split())
+        if normalized in self.seen:
+            return self.seen[normalized]
+        doc = self.seen[normalized] = len(self.passages)
+        self.passages.append(passage)
+        counts = {}
+        tokens = self.tokenize(passage)
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, frequency in counts.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = (array('i'), array('i'))
+            posting[0].append(doc)
+            posting[1].append(frequency)
+        self.lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        self.norms = None
+        self.vector_index = None
+        return doc
+
+    def length_norms(self):
+        if self.norms is None:
+            average = self.total_length / max(len(self.lengths), 1) or 1.0
+            self.norms = array('d', (self.k1 * (1 - self.b + self.b * length / average) for length in self.lengths))
+        return self.norms
+
+    def terms(self, question):
+        terms = []
+        for token in self.tokenize(question):
+            if len(token) > 3 and token not in self.stopwords and token in self.postings and token not in terms:
+                terms.append(token)
+        return terms
+
+    def search(self, question: str, top_k: int = None) -> List[str]:
+        terms = self.terms(question)
+        if not terms:
+            return []
+        top_k = top_k or self.top_k
+        total, norms, k1 = len(self.passages), self.length_norms(), self.k1
+        postings = [self.postings[term] for term in terms]
+        if SCIPY_AVAILABLE and sum(len(docs) for docs, _ in postings) > 4096:
+            scores = np.zeros(total)
+            norm_values = np.frombuffer(norms, dtype=np.float64)
+            for docs, frequencies in postings:
+                docs = np.frombuffer(docs, dtype=np.intc)
+                frequencies = np.frombuffer(frequencies, dtype=np.intc).astype(np.float64)
+                idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+                scores[docs] += idf * frequencies * (k1 + 1) / (frequencies + norm_values[docs])
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > top_k:
+                threshold = np.partition(scores[candidates], len(candidates) - top_k)[len(candidates) - top_k]
+                above = candidates[scores[candidates] > threshold]
+                tied = candidates[scores[candidates] == threshold][:top_k - len(above)]
+                candidates = np.concatenate([above, tied])
+            ranked = sorted(candidates.tolist(), key=lambda doc: (-scores[doc], doc))
+        else:
+            scores = {}
+            for docs, frequencies in postings:
+                idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc, frequency in zip(docs, frequencies):
+                    scores[doc] = scores.get(doc, 0.0) + idf * frequency * (k1 + 1) / (frequency + norms[doc])
+            ranked = heapq.nsmallest(top_k, scores, key=lambda doc: (-scores[doc], doc))
+        return [self.passages[doc] for doc in ranked]
+
+    def vectors(self):
+        if self.vector_index is None and SCIPY_AVAILABLE:
+            fingerprint = VectorIndex.fingerprint_of(self.passages)
+            if self.vector_path and os.path.exists(self.vector_path):
+                index = VectorIndex.open(self.vector_path)
+                if index.fingerprint == fingerprint and len(index.passages) == len(self.passages):
+                    self.vector_index = index
+            if self.vector_index is None:
+                self.vector_index = VectorIndex().build(self.passages)
+                if self.vector_path:
+                    self.vector_index.save(self.vector_path)
+        return self.vector_index
+
+    def semantic_search(self, question: str, top_k: int = None) -> List[str]:
+        index = self.vectors()
+        if index is None:
+            return []
+        question = " ".join(token for token in self.tokenize(question) if token not in self.stopwords)
+        return [passage for score, passage in index.search(question, top_k or self.top_k) if score >= self.min_similarity]
+
     def query(self, question: str) -> str:
-        question_lower = question.lower()
-        relevant_entries = []
-        entities = re.findall(r'\b([a-z]+)\b', question_lower)
-        relevant_entities = [entity for entity in entities if len(entity) > 3 and entity not in ["what", "who", "where", "when", "tell", "about", "family", "relationship"]]
-        for entity in relevant_entities:
-            for entry in self.knowledge:
-                if entity in entry.lower():
-                    relevant_entries.append(entry)
+        relevant_entries = self.search(question) or self.semantic_search(question)
         if relevant_entries:
             return "Based on my knowledge: " + " ".join(relevant_entries)
         else:
             return "I don't have specific information about that relationship in my knowledge base."
 
+class AnswerCache:
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or int(os.getenv("ANSWER_CACHE_SIZE", "4096"))
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(formulation):
+        args = tuple(None if isinstance(arg, Var) else arg for arg in formulation.get("args", []))
+        return (formulation.get("predicate"), args, formulation.get("query_type"))
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self.entries[key]
+                self.stale += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, version, answer):
+        with self.lock:
+            self.entries[key] = (version, answer)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries)
+            }
+
+logger = logging.getLogger(__name__)
+pool_instance = None
+PARALLEL_MIN_QUESTIONS = int(os.getenv("LOGIC_LM_PARALLEL_MIN_QUESTIONS", "256"))
+
+def answer_in_worker(question):
+    return pool_instance.answer_question(question)
+
+def fork_is_safe():
+    return "fork" in multiprocessing.get_all_start_methods() and sys.platform != "darwin" and threading.active_count() == 1
+
 class LogicLM:
     def __init__(self):
         self.kb = KnowledgeBase()
@@ -297,14 +1249,51 @@ class LogicLM:
         self.symbolic_reasoner = SymbolicReasoner(self.kb)
         self.result_interpreter = ResultInterpreter()
         self.simple_rag = SimpleRAG()
+        self.answer_cache = AnswerCache()
     
     def answer_question(self, question: str) -> str:
+        return "\n".join(self.stream_answer(question))
+
+    def stream_answer(self, question: str) -> Iterator[str]:
         formulation = self.problem_formulator.formulate(question)
         if not formulation.get("predicate"):
-            return self.simple_rag.query(question)
+            yield self.simple_rag.query(question)
+            return
+        key = AnswerCache.key(formulation)
+        version = self.kb.version
+        answer = self.answer_cache.get(key, version)
+        if answer is not None:
+            yield from answer.split("\n")
+            return
+        lines = []
         reasoning_results = self.symbolic_reasoner.reason(formulation)
-        answer = self.result_interpreter.interpret(reasoning_results, formulation)
-        return answer
+        for line in self.result_interpreter.iter_interpret(reasoning_results, formulation):
+            lines.append(line)
+            yield line
+        self.answer_cache.put(key, version, "\n".join(lines))
+
+    def write_answer(self, question: str, out, buffer_size: int = 65536) -> int:
+        return write_lines(self.stream_answer(question), out, buffer_size)
+
+    def answer_questions(self, questions: Iterable[str], workers: int = None, chunksize: int = 64) -> List[str]:
+        global pool_instance
+        questions = list(questions)
+        requested = workers
+        if workers is None:
+            workers = 1 if len(questions) < PARALLEL_MIN_QUESTIONS else os.cpu_count() or 1
+        workers = min(workers, -(-len(questions) // chunksize))
+        if workers > 1 and not fork_is_safe():
+            if requested is not None:
+                logger.warning("Answering %d questions serially instead of with %d workers: forking is not safe in this process (%d threads running)", len(questions), workers, threading.active_count())
+            workers = 1
+        if workers <= 1:
+            return [self.answer_question(question) for question in questions]
+        pool_instance = self
+        try:
+            with multiprocessing.get_context("fork").Pool(workers) as pool:
+                return list(pool.imap(answer_in_worker, questions, chunksize))
+        finally:
+            pool_instance = None
 
 if __name__ == "__main__":
     logic_lm = LogicLM()
@@ -318,11 +1307,12 @@ if __name__ == "__main__":
         "Is mike a grandparent of bob?",
         "Tell me about John's family.",
         "Who is the father of emma?",
-        "Is james a grandparent of lucy?"
+        "Is james a grandparent of lucy?",
+        "Who are the ancestors of emma?",
+        "Is mike an ancestor of bob?"
     ]
     print("Family Relationship Query System")
     print("=" * 30)
-    for question in questions:
+    for question, answer in zip(questions, logic_lm.answer_questions(questions)):
         print(f"\nQuestion: {question}")
-        answer = logic_lm.answer_question(question)
         print(f"Answer: {answer}")
\ No newline at end of file
@@ -0,0 +1,33 @@
+from logic_lm_langchain import FactStore, KnowledgeBase, Var
+
+FACTS = [('father', 'john', 'alice'), ('father', 'john', 'bob'), ('mother', 'mary', 'alice'), ('person', 'zoë'), ('likes', 'bob', 'alice', 'chess')]
+
+def test_round_trip_preserves_facts_and_matches(tmp_path):
+    path = str(tmp_path / 'facts.snapshot')
+    store = FactStore(FACTS)
+    store.save(path)
+    loaded = FactStore.open(path)
+    assert sorted(loaded) == sorted(store)
+    assert len(loaded) == len(store)
+    for predicate, pattern in [('father', ('john',)), ('father', (None, 'bob')), ('person', ('zoë',)), ('likes', (None, None, 'chess')), ('mother', ('sarah',))]:
+        assert sorted(loaded.match(predicate, pattern)) == sorted(store.match(predicate, pattern))
+
+def test_loaded_snapshot_accepts_updates(tmp_path):
+    path = str(tmp_path / 'facts.snapshot')
+    FactStore(FACTS).save(path)
+    loaded = FactStore.open(path)
+    loaded.add(('father', 'bob', 'emma'))
+    assert loaded.remove(('father', 'john', 'alice'))
+    assert sorted(loaded.match('father', ())) == [('bob', 'emma'), ('john', 'bob')]
+    loaded.save(path)
+    assert sorted(FactStore.open(path)) == sorted(loaded)
+
+def test_knowledge_base_answers_the_same_from_a_snapshot(tmp_path):
+    path = str(tmp_path / 'kb.snapshot')
+    kb = KnowledgeBase()
+    kb.facts.save(path)
+    restored = KnowledgeBase(snapshot=path)
+    for predicate in ['is_father', 'is_sibling', 'is_grandparent', 'is_ancestor']:
+        expected = sorted(sorted(answer.items()) for answer in kb.query_rule(predicate, [Var('X'), Var('Y')]))
+        assert expected
+        assert sorted(sorted(answer.items()) for answer in restored.query_rule(predicate, [Var('X'), Var('Y')])) == expected
@@ -0,0 +1,50 @@
+import threading
+
+from logic_lm_langchain import KnowledgeBase, SimpleRAG, Var, VectorIndex
+
+def test_vector_index_reopens_from_disk(tmp_path):
+    path = str(tmp_path / 'passages.vectors')
+    built = SimpleRAG(vector_path=path)
+    expected = built.semantic_search("Tell me about Jenifer")
+    assert expected
+    reopened = SimpleRAG(vector_path=path)
+    index = reopened.vectors()
+    assert index.mapping is not None
+    assert len(index.passages) == len(built.passages)
+    assert reopened.semantic_search("Tell me about Jenifer") == expected
+    assert VectorIndex.open(path).search("jenifer", 3) == built.vectors().search("jenifer", 3)
+
+def father_chain(length):
+    kb = KnowledgeBase()
+    for i in range(length):
+        kb.add_fact(('father', f'p{i}', f'p{i + 1}'))
+    return kb
+
+def test_concurrent_tabled_queries_do_not_share_evaluation_state():
+    kb = father_chain(150)
+    errors = []
+    def work(offset):
+        for step in range(10):
+            if step % 5 == 0:
+                kb.tables.clear()
+            target = 140 - (offset + step) % 7
+            found = kb.query_rule('is_ancestor', [Var('X'), f'p{target}'])
+            if len(found) != target:
+                errors.append((target, len(found)))
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+def test_tables_are_not_published_after_the_facts_change():
+    kb = father_chain(3)
+    derive_ancestor = kb.derive_ancestor
+    def changing(pattern, evaluation):
+        answers = derive_ancestor(pattern, evaluation)
+        kb.facts_changed()
+        return answers
+    kb.tabled_rules['is_ancestor'] = changing
+    assert len(kb.query_rule('is_ancestor', [Var('X'), 'p3'])) == 3
+    assert kb.tables == {}
@@ -0,0 +1,68 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = [
+    (os.path.join(ROOT, "Task-8"), "logic_lm_langchain"),
+    (os.path.join(ROOT, "Task-9"), "login_lm_langraph"),
+    (os.path.join(ROOT, "Task-9"), "logic_lm_server"),
+]
+HEAVY_PACKAGES = {"langchain", "langchain_community", "langchain_core", "openai", "faiss", "tiktoken", "numpy", "scipy"}
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import {module} as module
+imported = time.perf_counter()
+module.LogicLM().answer_question("Who is the father of alice?")
+answered = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "first_answer_ms": (answered - imported) * 1000,
+    "heavy": sorted({{name.split(".")[0] for name in sys.modules}} & {heavy!r})
+}}))
+"""
+
+def slowest_imports(importtime_output, limit=5):
+    rows = []
+    for line in importtime_output.splitlines():
+        parts = line[len("import time:"):].split("|")
+        if line.startswith("import time:") and len(parts) == 3 and parts[0].strip().isdigit():
+            rows.append((int(parts[0]), parts[2].strip()))
+    return [f"{name} {self_us / 1000:.1f}ms" for self_us, name in sorted(rows, reverse=True)[:limit]]
+
+def measure(path, module, runs):
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE.format(path=path, module=module, heavy=HEAVY_PACKAGES)],
+            capture_output=True, text=True, cwd=path
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"{module} failed to start:\n{completed.stderr[-2000:]}")
+        samples.append((json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr))
+    return {
+        "import_ms": statistics.median(sample["import_ms"] for sample, _ in samples),
+        "first_answer_ms": statistics.median(sample["first_answer_ms"] for sample, _ in samples),
+        "heavy": samples[-1][0]["heavy"],
+        "slowest": slowest_imports(samples[-1][1])
+    }
+
+if __name__ == "__main__":
+    runs = int(os.getenv("STARTUP_RUNS", "5"))
+    budget = float(os.getenv("STARTUP_BUDGET_MS", "250"))
+    failed = False
+    for path, module in MODULES:
+        result = measure(path, module, runs)
+        over_budget = result["import_ms"] + result["first_answer_ms"] > budget
+        failed = failed or over_budget or bool(result["heavy"])
+        print(f"{module}: import {result['import_ms']:.1f}ms, first answer {result['first_answer_ms']:.1f}ms (median of {runs})")
+        print(f"  slowest imports: {', '.join(result['slowest'])}")
+        if result["heavy"]:
+            print(f"  FAIL: loaded optional backends at startup: {', '.join(result['heavy'])}")
+        if over_budget:
+            print(f"  FAIL: startup exceeds the {budget:.0f}ms budget")
+    sys.exit(1 if failed else 0)
\ No newline at end of file
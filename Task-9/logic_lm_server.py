@@ -0,0 +1,299 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+
+import login_lm_langraph
+from login_lm_langraph import LogicLM, answer_in_worker
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+MAX_BODY_BYTES = 1024 * 1024
+
+class ServerBusy(Exception):
+    pass
+
+CACHE_COUNTERS = ("hits", "misses", "stale", "evictions", "entries")
+
+def settle(future, method, value):
+    if not future.done():
+        method(value)
+
+def inherited_descriptors():
+    try:
+        return [int(name) for name in os.listdir("/proc/self/fd")]
+    except OSError:
+        return range(3, min(os.sysconf("SC_OPEN_MAX"), 65536))
+
+def release_inherited_sockets():
+    null = os.open(os.devnull, os.O_RDWR)
+    for fd in inherited_descriptors():
+        try:
+            if fd != null and stat.S_ISSOCK(os.fstat(fd).st_mode):
+                os.dup2(null, fd)
+        except OSError:
+            pass
+    os.close(null)
+
+def answer_with_stats(question):
+    answer = answer_in_worker(question)
+    return answer, os.getpid(), login_lm_langraph.pool_instance.answer_cache.stats()
+
+class LogicLMServer:
+    def __init__(self, logic_lm=None, concurrency=None, max_pending=None, grace=None):
+        self.logic_lm = logic_lm or LogicLM()
+        self.concurrency = concurrency or int(os.getenv("LOGIC_LM_CONCURRENCY", str(os.cpu_count() or 1)))
+        self.max_pending = max_pending or int(os.getenv("LOGIC_LM_MAX_PENDING", "256"))
+        self.grace = grace or float(os.getenv("LOGIC_LM_SHUTDOWN_GRACE", "10"))
+        self.inflight = {}
+        self.pending = 0
+        self.slots = None
+        self.pool = None
+        self.pool_version = None
+        self.retired_pools = set()
+        self.worker_cache_stats = {}
+        self.executor = None
+        self.servers = []
+        self.connections = {}
+        self.stopping = None
+        self.stats = {"requests": 0, "evaluations": 0, "coalesced": 0, "rejected": 0}
+
+    async def start(self, host="127.0.0.1", http_port=8080, jsonl_port=8081):
+        self.slots = asyncio.Semaphore(self.concurrency)
+        self.stopping = asyncio.Event()
+        if self.concurrency > 1 and "fork" in multiprocessing.get_all_start_methods():
+            self.start_pool()
+        else:
+            self.executor = ThreadPoolExecutor(1)
+        if http_port is not None:
+            self.servers.append(await asyncio.start_server(self.handle_http, host, http_port))
+        if jsonl_port is not None:
+            self.servers.append(await asyncio.start_server(self.handle_jsonl, host, jsonl_port))
+        return [server.sockets[0].getsockname()[1] for server in self.servers]
+
+    def start_pool(self):
+        login_lm_langraph.pool_instance = self.logic_lm
+        self.pool_version = self.logic_lm.kb.version
+        self.worker_cache_stats = {}
+        self.pool = multiprocessing.get_context("fork").Pool(self.concurrency, initializer=release_inherited_sockets)
+
+    def recycle_pool(self):
+        retired = self.pool
+        retired.close()
+        self.retired_pools.add(retired)
+        joined = asyncio.get_running_loop().run_in_executor(None, retired.join)
+        joined.add_done_callback(lambda _: self.retired_pools.discard(retired))
+        self.start_pool()
+
+    def evaluate(self, question):
+        loop = asyncio.get_running_loop()
+        if self.pool is None:
+            return loop.run_in_executor(self.executor, self.logic_lm.answer_question, question)
+        if self.logic_lm.kb.version != self.pool_version:
+            self.recycle_pool()
+        pool = self.pool
+        future = loop.create_future()
+        def answered(result):
+            answer, pid, cache_stats = result
+            if pool is self.pool:
+                self.worker_cache_stats[pid] = cache_stats
+            settle(future, future.set_result, answer)
+        pool.apply_async(
+            answer_with_stats, (question,),
+            callback=lambda result: loop.call_soon_threadsafe(answered, result),
+            error_callback=lambda error: loop.call_soon_threadsafe(settle, future, future.set_exception, error)
+        )
+        return future
+
+    def coalesce_key(self, question):
+        return (self.logic_lm.kb.version, " ".join(question.lower().split()))
+
+    def cache_stats(self):
+        if self.pool is None:
+            return self.logic_lm.answer_cache.stats()
+        totals = {name: sum(stats[name] for stats in self.worker_cache_stats.values()) for name in CACHE_COUNTERS}
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = totals["hits"] / lookups if lookups else 0.0
+        totals["workers"] = len(self.worker_cache_stats)
+        return totals
+
+    async def answer(self, question: str) -> str:
+        self.stats["requests"] += 1
+        key = self.coalesce_key(question)
+        task = self.inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            if self.pending >= self.max_pending or self.stopping.is_set():
+                self.stats["rejected"] += 1
+                raise ServerBusy()
+            self.pending += 1
+            task = self.inflight[key] = asyncio.ensure_future(self.run(key, question))
+        return await asyncio.shield(task)
+
+    async def run(self, key, question):
+        try:
+            async with self.slots:
+                self.stats["evaluations"] += 1
+                return await self.evaluate(question)
+        finally:
+            self.pending -= 1
+            self.inflight.pop(key, None)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "status": "stopping" if self.stopping.is_set() else "ok",
+            "pending": self.pending,
+            "concurrency": self.concurrency,
+            "max_pending": self.max_pending,
+            **self.stats,
+            "cache": self.cache_stats()
+        }
+
+    def track(self, reader):
+        task = asyncio.current_task()
+        self.connections[task] = reader
+        task.add_done_callback(lambda done: self.connections.pop(done, None))
+
+    async def handle_http(self, reader, writer):
+        self.track(reader)
+        try:
+            while not self.stopping.is_set():
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                parts = request_line.decode("latin-1").split()
+                method, path, version = (parts + ["", "", ""])[:3]
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    await self.send_http(writer, 413, {"error": "Request body too large"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                status, payload, extra = await self.route(method, path.split("?")[0], body)
+                await self.send_http(writer, status, payload, extra, close=not keep_alive or self.stopping.is_set())
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        if path == "/health":
+            return 200, self.status(), {}
+        if path != "/answer":
+            return 404, {"error": f"Unknown path '{path}'"}, {}
+        if method != "POST":
+            return 405, {"error": "Use POST with a JSON body"}, {"Allow": "POST"}
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            return 400, {"error": "Body is not valid JSON"}, {}
+        questions = request.get("questions") if isinstance(request, dict) else None
+        question = request.get("question") if isinstance(request, dict) else None
+        try:
+            if isinstance(questions, list) and all(isinstance(q, str) for q in questions):
+                answers = await asyncio.gather(*(self.answer(q) for q in questions))
+                return 200, {"answers": [{"question": q, "answer": a} for q, a in zip(questions, answers)]}, {}
+            if isinstance(question, str):
+                return 200, {"question": question, "answer": await self.answer(question)}, {}
+        except ServerBusy:
+            return 503, {"error": "Server is busy, retry later"}, {"Retry-After": "1"}
+        except Exception as e:
+            return 500, {"error": str(e)}, {}
+        return 400, {"error": "Expected {\"question\": str} or {\"questions\": [str]}"}, {}
+
+    async def send_http(self, writer, status, payload, extra=None, close=False):
+        body = json.dumps(payload).encode()
+        lines = [f"HTTP/1.1 {status} {HTTP_REASONS[status]}", "Content-Type: application/json", f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in (extra or {}).items())
+        lines.append("Connection: close" if close else "Connection: keep-alive")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def handle_jsonl(self, reader, writer):
+        self.track(reader)
+        lock = asyncio.Lock()
+        requests = set()
+        try:
+            while not self.stopping.is_set():
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.ensure_future(self.reply_jsonl(writer, lock, line))
+                requests.add(task)
+                task.add_done_callback(requests.discard)
+            if requests:
+                await asyncio.gather(*requests, return_exceptions=True)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def reply_jsonl(self, writer, lock, line):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict) or not isinstance(request.get("question"), str):
+                raise ValueError()
+            request_id = request.get("id")
+            response = {"id": request_id, "answer": await self.answer(request["question"])}
+        except ServerBusy:
+            response = {"id": request_id, "error": "busy"}
+        except ValueError:
+            response = {"id": request_id, "error": "Expected a JSON object with a \"question\" string"}
+        except Exception as e:
+            response = {"id": request_id, "error": str(e)}
+        async with lock:
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+    async def shutdown(self):
+        self.stopping.set()
+        for server in self.servers:
+            server.close()
+        for server in self.servers:
+            await server.wait_closed()
+        for reader in self.connections.values():
+            reader.feed_eof()
+        if self.connections:
+            _, remaining = await asyncio.wait(list(self.connections), timeout=self.grace)
+            for task in remaining:
+                task.cancel()
+        if self.pool is not None:
+            for pool in list(self.retired_pools) + [self.pool]:
+                pool.terminate()
+            self.retired_pools.clear()
+        else:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        login_lm_langraph.pool_instance = None
+
+    async def serve_forever(self, host="127.0.0.1", http_port=8080, jsonl_port=8081):
+        ports = await self.start(host, http_port, jsonl_port)
+        print(f"LogicLM serving HTTP on {host}:{ports[0]} and JSON lines on {host}:{ports[-1]}")
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.stopping.set)
+        await self.stopping.wait()
+        await self.shutdown()
+
+if __name__ == "__main__":
+    server = LogicLMServer()
+    asyncio.run(server.serve_forever(
+        os.getenv("LOGIC_LM_HOST", "127.0.0.1"),
+        int(os.getenv("LOGIC_LM_HTTP_PORT", "8080")),
+        int(os.getenv("LOGIC_LM_JSONL_PORT", "8081"))
+    ))
\ No newline at end of file
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from login_lm_langraph import LogicLM
+from logic_lm_server import LogicLMServer
+
+@pytest.fixture(scope="module")
+def logic_lm():
+    return LogicLM()
+
+def slow_answers(logic_lm, monkeypatch, delay=0.2):
+    answer_question = logic_lm.answer_question
+    def slow(question):
+        time.sleep(delay)
+        return answer_question(question)
+    monkeypatch.setattr(logic_lm, "answer_question", slow)
+
+async def request(reader, writer, method, path, payload=None, close=False):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    headers = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+    if close:
+        headers.append("Connection: close")
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    payload = json.loads(await reader.readexactly(int(response_headers["content-length"])))
+    return status, response_headers, payload
+
+async def started(server):
+    http_port, jsonl_port = await server.start(http_port=0, jsonl_port=0)
+    return http_port, jsonl_port
+
+def test_identical_questions_are_coalesced(logic_lm, monkeypatch):
+    slow_answers(logic_lm, monkeypatch)
+    async def scenario():
+        server = LogicLMServer(logic_lm, concurrency=1)
+        await started(server)
+        answers = await asyncio.gather(*(server.answer(q) for q in ["Who is the father of alice?", "who is the father of alice? "] * 3))
+        await server.shutdown()
+        return server, answers
+    server, answers = asyncio.run(scenario())
+    assert len(set(answers)) == 1
+    assert server.stats["evaluations"] == 1
+    assert server.stats["coalesced"] == 5
+
+def test_full_queue_returns_503(logic_lm, monkeypatch):
+    slow_answers(logic_lm, monkeypatch)
+    async def scenario():
+        server = LogicLMServer(logic_lm, concurrency=1, max_pending=1)
+        http_port, _ = await started(server)
+        reader, writer = await asyncio.open_connection("127.0.0.1", http_port)
+        response = await request(reader, writer, "POST", "/answer", {"questions": ["Who is the father of alice?", "Who is the mother of alice?"]})
+        writer.close()
+        await server.shutdown()
+        return server, response
+    server, (status, headers, payload) = asyncio.run(scenario())
+    assert status == 503
+    assert headers["retry-after"] == "1"
+    assert server.stats["rejected"] == 1
+
+def test_http_connections_are_kept_alive(logic_lm):
+    async def scenario():
+        server = LogicLMServer(logic_lm, concurrency=1)
+        http_port, _ = await started(server)
+        reader, writer = await asyncio.open_connection("127.0.0.1", http_port)
+        first = await request(reader, writer, "POST", "/answer", {"question": "Who is the father of alice?"})
+        second = await request(reader, writer, "GET", "/health", close=True)
+        closed = await reader.read()
+        writer.close()
+        await server.shutdown()
+        return first, second, closed
+    first, second, closed = asyncio.run(scenario())
+    assert first[0] == 200 and first[1]["connection"] == "keep-alive"
+    assert first[2]["answer"]
+    assert second[0] == 200 and second[1]["connection"] == "close"
+    assert second[2]["requests"] == 1
+    assert closed == b""
+
+def test_shutdown_finishes_inflight_requests(logic_lm, monkeypatch):
+    slow_answers(logic_lm, monkeypatch)
+    async def scenario():
+        server = LogicLMServer(logic_lm, concurrency=1)
+        http_port, jsonl_port = await started(server)
+        reader, writer = await asyncio.open_connection("127.0.0.1", http_port)
+        inflight = asyncio.ensure_future(request(reader, writer, "POST", "/answer", {"question": "Who is the father of alice?"}))
+        await asyncio.sleep(0.05)
+        await server.shutdown()
+        response = await inflight
+        writer.close()
+        try:
+            await asyncio.open_connection("127.0.0.1", jsonl_port)
+            refused = False
+        except OSError:
+            refused = True
+        return response, refused
+    (status, headers, payload), refused = asyncio.run(scenario())
+    assert status == 200 and payload["answer"]
+    assert headers["connection"] == "close"
+    assert refused
+
+def test_worker_pool_sees_knowledge_base_updates_and_reports_cache_stats():
+    logic_lm = LogicLM()
+    async def scenario():
+        server = LogicLMServer(logic_lm, concurrency=2)
+        await started(server)
+        if server.pool is None:
+            await server.shutdown()
+            pytest.skip("fork start method is unavailable")
+        before = await server.answer("Who is the father of zed?")
+        logic_lm.kb.add_fact(("father", "abe", "zed"))
+        after = await server.answer("Who is the father of zed?")
+        await server.answer("Who is the father of alice?")
+        await server.answer("Who is the father of alice?")
+        status = server.status()
+        await server.shutdown()
+        return before, after, status
+    before, after, status = asyncio.run(scenario())
+    assert before != after
+    assert after == "abe is the father of zed."
+    assert status["cache"]["hits"] + status["cache"]["misses"] > 0
+    assert status["cache"]["workers"] >= 1
+
+def test_coalescing_keys_follow_the_question_text(logic_lm):
+    server = LogicLMServer(logic_lm, concurrency=1)
+    assert server.coalesce_key("Who is the father of alice?") == server.coalesce_key("  who is the FATHER of   alice? ")
+    assert server.coalesce_key("Who is the father of alice?") != server.coalesce_key("Who is the father of alice, and why?")
@@ -0,0 +1,144 @@
+import threading
+import time
+
+from login_lm_langraph import GraphExecutor, KnowledgeBase, LogicLM, SimpleRAG, Var, VectorIndex
+
+def father_chain(length):
+    kb = KnowledgeBase()
+    for i in range(length):
+        kb.add_fact(("father", f"p{i}", f"p{i + 1}"))
+    return kb
+
+def test_concurrent_tabled_queries_do_not_share_evaluation_state():
+    kb = father_chain(150)
+    errors = []
+    def work(offset):
+        for step in range(10):
+            if step % 5 == 0:
+                kb.tables.clear()
+            target = 140 - (offset + step) % 7
+            found = kb.query_rule("is_ancestor", [Var("X"), f"p{target}"])
+            if len(found) != target:
+                errors.append((target, len(found)))
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(kb.query_rule("is_ancestor", [Var("X"), "p140"])) == 140
+
+def test_tables_are_not_published_after_the_facts_change():
+    kb = father_chain(3)
+    derive_ancestor = kb.derive_ancestor
+    def changing(pattern, evaluation):
+        answers = derive_ancestor(pattern, evaluation)
+        kb.facts_changed()
+        return answers
+    kb.tabled_rules["is_ancestor"] = changing
+    assert len(kb.query_rule("is_ancestor", [Var("X"), "p3"])) == 3
+    assert kb.tables == {}
+
+def test_race_waits_for_cancelled_branches():
+    started, finished = threading.Event(), []
+    def fast(state, cancelled):
+        started.wait()
+        return {"answer": "fast", "confidence": 1.0}
+    def slow(state, cancelled):
+        started.set()
+        while not cancelled.is_set():
+            time.sleep(0.01)
+        time.sleep(0.05)
+        finished.append("slow")
+        return {"answer": None, "confidence": 0.0}
+    graph = GraphExecutor()
+    graph.add_node("fast", fast)
+    graph.add_node("slow", slow)
+    state = {}
+    assert graph.race(["fast", "slow"], state) == "fast"
+    assert finished == ["slow"]
+    assert state["answer"] == "fast"
+
+def racing_graph(symbolic, retrieval, symbolic_delay, retrieval_delay):
+    def branch(update, delay):
+        def node(state, cancelled):
+            time.sleep(delay)
+            return dict(update)
+        return node
+    graph = GraphExecutor(accept=0.75)
+    graph.add_node("symbolic", branch(symbolic, symbolic_delay))
+    graph.add_node("retrieval", branch(retrieval, retrieval_delay))
+    return graph
+
+def test_race_prefers_the_earlier_branch_when_both_are_confident():
+    graph = racing_graph({"answer": "symbolic", "confidence": 0.8}, {"answer": "retrieval", "confidence": 0.9}, 0.05, 0.0)
+    state = {}
+    assert graph.race(["symbolic", "retrieval"], state) == "symbolic"
+    assert state["answer"] == "symbolic"
+
+def test_race_falls_through_to_a_confident_later_branch():
+    graph = racing_graph({"answer": "symbolic", "confidence": 0.7}, {"answer": "retrieval", "confidence": 0.9}, 0.0, 0.05)
+    assert graph.race(["symbolic", "retrieval"], {}) == "retrieval"
+    graph = racing_graph({"answer": "symbolic", "confidence": 0.7}, {"answer": "retrieval", "confidence": 0.5}, 0.05, 0.0)
+    assert graph.race(["symbolic", "retrieval"], {}) == "symbolic"
+
+def test_streamed_answers_match_graph_answers():
+    logic_lm = LogicLM()
+    for question in ["Who are the ancestors of emma?", "Who is the father of zed?", "Tell me about Jenifer", "Is mike an ancestor of bob?"]:
+        expected = logic_lm.answer_question(question)
+        assert "\n".join(LogicLM().stream_answer(question)) == expected
+        assert "\n".join(logic_lm.stream_answer(question)) == expected
+
+def test_retrieval_falls_back_to_semantic_search():
+    rag = LogicLM().simple_rag
+    question = "Tell me about Jenifer"
+    assert rag.search(question) == []
+    answer, confidence = rag.query_with_confidence(question)
+    hits = rag.semantic_search(question)
+    assert hits and confidence == hits[0][0]
+    assert answer == "Based on my knowledge: " + " ".join(passage for _, passage in hits)
+
+def test_vector_index_reopens_from_disk(tmp_path):
+    path = str(tmp_path / "passages.vectors")
+    built = SimpleRAG(vector_path=path)
+    expected = built.semantic_search("Tell me about Jenifer")
+    assert expected
+    reopened = SimpleRAG(vector_path=path)
+    index = reopened.vectors()
+    assert index.mapping is not None
+    assert len(index.passages) == len(built.passages)
+    assert reopened.semantic_search("Tell me about Jenifer") == expected
+    assert VectorIndex.open(path).search("jenifer", 3) == built.vectors().search("jenifer", 3)
+
+def test_unknown_entities_keep_the_symbolic_answer():
+    logic_lm = LogicLM()
+    assert logic_lm.answer_question("Who is the father of zed?") == "I couldn't find any fathers of zed based on the available information."
+    assert logic_lm.answer_question("Is zed the father of bob?") == "No, zed is not the father of bob based on the available information."
+    logic_lm.kb.add_fact(("father", "abe", "zed"))
+    assert logic_lm.answer_question("Who is the father of zed?") == "abe is the father of zed."
+
+def test_retrieval_confidence_requires_the_bound_entities():
+    rag = LogicLM().simple_rag
+    answer, confidence = rag.query_with_confidence("Who is the father of zed?")
+    assert answer.startswith("Based on my knowledge:") and confidence == 1.0
+    assert rag.query_with_confidence("Who is the father of zed?", entities=["zed"])[1] == 0.0
+    assert rag.query_with_confidence("Who is the father of lucy?", entities=["lucy"])[1] == 1.0
+
+def test_races_leave_no_threads_behind():
+    logic_lm = LogicLM()
+    before = threading.active_count()
+    assert logic_lm.graph.run({"question": "Who is the father of zed?"})["branch"] == "symbolic"
+    assert threading.active_count() == before
+
+def test_unsafe_fork_with_explicit_workers_warns(caplog):
+    logic_lm = LogicLM()
+    release = threading.Event()
+    blocker = threading.Thread(target=release.wait)
+    blocker.start()
+    try:
+        answers = logic_lm.answer_questions(["Who is the father of alice?"] * 130, workers=2)
+    finally:
+        release.set()
+        blocker.join()
+    assert answers == ["john is the father of alice."] * 130
+    assert "serially instead of with 2 workers" in caplog.text
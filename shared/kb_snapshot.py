@@ -0,0 +1,154 @@
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+
+class SymbolTable:
+    def __init__(self):
+        self.symbols = []
+        self.ids = {}
+
+    def intern(self, symbol):
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def lookup(self, symbol):
+        return self.ids.get(symbol)
+
+    def __len__(self):
+        return len(self.symbols)
+
+class MappedStrings:
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+        self.count = len(offsets) - 1
+        self.added = []
+
+    def __len__(self):
+        return self.count + len(self.added)
+
+    def __getitem__(self, index):
+        if index < self.count:
+            return str(self.blob[self.offsets[index]:self.offsets[index + 1]], 'utf-8')
+        return self.added[index - self.count]
+
+    def append(self, symbol):
+        self.added.append(symbol)
+
+class MappedSymbolTable:
+    def __init__(self, offsets, blob, order):
+        self.symbols = MappedStrings(offsets, blob)
+        self.order = order
+        self.ids = {}
+
+    def encoded(self, symbol_id):
+        offsets = self.symbols.offsets
+        return bytes(self.symbols.blob[offsets[symbol_id]:offsets[symbol_id + 1]])
+
+    def intern(self, symbol):
+        symbol_id = self.lookup(symbol)
+        if symbol_id is None:
+            symbol_id = self.ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def lookup(self, symbol):
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is not None or not isinstance(symbol, str):
+            return symbol_id
+        encoded = symbol.encode('utf-8')
+        position = bisect_left(self.order, encoded, key=self.encoded)
+        if position < len(self.order) and self.encoded(self.order[position]) == encoded:
+            return self.order[position]
+        return None
+
+    def __len__(self):
+        return len(self.symbols)
+
+class StaleSnapshotError(ValueError):
+    pass
+
+SNAPSHOT_MAGIC = b'KBSN'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<4sIQQ32s')
+SNAPSHOT_RELATION = struct.Struct('<IIQ')
+NO_SOURCE = b'\0' * 32
+
+def source_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+def section_end(position):
+    return (position + 7) & ~7
+
+def write_section(f, data):
+    f.write(data)
+    padding = section_end(f.tell()) - f.tell()
+    if padding:
+        f.write(b'\0' * padding)
+
+def lexicographic_order(columns, rows):
+    order = list(range(rows))
+    for column in reversed(columns):
+        order.sort(key=column.__getitem__)
+    return array('i', order)
+
+def save_snapshot(path, symbols, relations, source=NO_SOURCE):
+    encoded = [symbol.encode('utf-8') for symbol in symbols]
+    offsets = array('q', [0])
+    for symbol in encoded:
+        offsets.append(offsets[-1] + len(symbol))
+    order = array('i', sorted(range(len(encoded)), key=encoded.__getitem__))
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        write_section(f, SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(encoded), len(relations), source))
+        write_section(f, offsets)
+        write_section(f, b''.join(encoded))
+        write_section(f, order)
+        for predicate, rows, columns, sorted_rows, sorted_facts in relations:
+            name = predicate.encode('utf-8')
+            write_section(f, SNAPSHOT_RELATION.pack(len(name), len(columns), rows) + name)
+            for column in columns:
+                write_section(f, column)
+            for column_rows in sorted_rows:
+                write_section(f, column_rows)
+            write_section(f, sorted_facts)
+    os.replace(temp_path, path)
+
+def open_snapshot(path, source=None):
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    if len(view) < SNAPSHOT_HEADER.size:
+        raise ValueError(f"{path} is not a knowledge base snapshot")
+    magic, version, symbol_count, relation_count, saved_source = SNAPSHOT_HEADER.unpack_from(view, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f"{path} is not a knowledge base snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"{path} has snapshot version {version}, expected {SNAPSHOT_VERSION}")
+    if source is not None and saved_source != source:
+        raise StaleSnapshotError(f"{path} was built from a different version of its source")
+    position = section_end(SNAPSHOT_HEADER.size)
+    def take(size, format='B'):
+        nonlocal position
+        section = view[position:position + size]
+        position = section_end(position + size)
+        return section.cast(format)
+    offsets = take(8 * (symbol_count + 1), 'q')
+    blob = take(offsets[-1])
+    symbols = MappedSymbolTable(offsets, blob, take(4 * symbol_count, 'i'))
+    relations = []
+    for _ in range(relation_count):
+        name_length, arity, rows = SNAPSHOT_RELATION.unpack_from(view, position)
+        predicate = str(view[position + SNAPSHOT_RELATION.size:position + SNAPSHOT_RELATION.size + name_length], 'utf-8')
+        position = section_end(position + SNAPSHOT_RELATION.size + name_length)
+        columns = [take(4 * rows, 'i') for _ in range(arity)]
+        sorted_rows = [take(4 * rows, 'i') for _ in range(arity)]
+        relations.append((predicate, rows, columns, sorted_rows, take(4 * rows, 'i')))
+    return symbols, relations, mapping
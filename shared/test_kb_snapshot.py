@@ -0,0 +1,50 @@
+from array import array
+
+import pytest
+
+from kb_snapshot import NO_SOURCE, SNAPSHOT_HEADER, StaleSnapshotError, lexicographic_order, open_snapshot, save_snapshot
+
+SYMBOLS = ['homer', 'bart', 'lisa', 'zoë', '']
+
+def relation(predicate, *columns):
+    columns = [array('i', column) for column in columns]
+    rows = len(columns[0]) if columns else 0
+    sorted_rows = [array('i', sorted(range(rows), key=column.__getitem__)) for column in columns]
+    return (predicate, rows, columns, sorted_rows, lexicographic_order(columns, rows))
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'kb.snapshot')
+    relations = [relation('parent', [0, 0, 3], [1, 2, 4]), relation('male', [1, 0]), relation('empty', [], [])]
+    save_snapshot(path, SYMBOLS, relations)
+    symbols, loaded, _ = open_snapshot(path)
+    assert [symbols.symbols[i] for i in range(len(symbols))] == SYMBOLS
+    assert [symbols.lookup(symbol) for symbol in SYMBOLS] == list(range(len(SYMBOLS)))
+    assert symbols.lookup('maggie') is None
+    for expected, actual in zip(relations, loaded):
+        assert actual[:2] == expected[:2]
+        assert [list(column) for column in actual[2]] == [list(column) for column in expected[2]]
+        assert [list(rows) for rows in actual[3]] == [list(rows) for rows in expected[3]]
+        assert list(actual[4]) == list(expected[4])
+    assert symbols.intern('maggie') == len(SYMBOLS)
+    assert symbols.lookup('maggie') == len(SYMBOLS)
+
+def test_source_digest_is_checked(tmp_path):
+    path = str(tmp_path / 'kb.snapshot')
+    digest = b'\1' * 32
+    save_snapshot(path, SYMBOLS, [], digest)
+    open_snapshot(path, digest)
+    open_snapshot(path)
+    with pytest.raises(StaleSnapshotError):
+        open_snapshot(path, b'\2' * 32)
+    save_snapshot(path, SYMBOLS, [])
+    with pytest.raises(StaleSnapshotError):
+        open_snapshot(path, digest)
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'kb.snapshot'
+    path.write_bytes(b'not a snapshot')
+    with pytest.raises(ValueError, match='not a knowledge base snapshot'):
+        open_snapshot(str(path))
+    path.write_bytes(SNAPSHOT_HEADER.pack(b'KBSN', 99, 0, 0, NO_SOURCE))
+    with pytest.raises(ValueError, match='version 99'):
+        open_snapshot(str(path))